@@ -10,12 +10,17 @@ from poke_team import Trainer, PokeTeam
 from typing import Tuple
 from battle_mode import BattleMode
 from math import ceil
+from fractions import Fraction
+from contextlib import ExitStack
 
 class Battle:
     """
     This class represents a battle between two trainers
     """
-    def __init__(self, trainer_1: Trainer, trainer_2: Trainer, battle_mode: BattleMode, criterion="health") -> None:
+    FAST_FORWARD = True
+    matchups = None  # a matchup_matrix.MatchupMatrix SET duels are looked up in, see MatchupMatrix.enable()
+
+    def __init__(self, trainer_1: Trainer, trainer_2: Trainer, battle_mode: BattleMode, criterion="health", profiler=None, cache=None, log=None) -> None:
         """
         Initializing a new instance of a Battle class
 
@@ -23,6 +28,9 @@ class Battle:
         param arg2: Second trainer from Trainer class
         param arg3: the battle_mode of the battle
         param arg4: the criterion of the battle (only available in optimised mode)
+        param arg5: an optional instrumentation.BattleProfiler, attached to every commence_battle()
+        param arg6: an optional battle_cache.BattleCache, battles it has seen are replayed instead of fought
+        param arg7: an optional battle_log.BattleLog recording the events of every commence_battle(), the cache is not used then
         """
         self.trainer_1 = trainer_1
         self.trainer_2 = trainer_2
@@ -30,6 +38,9 @@ class Battle:
         self.criterion = criterion
         self.team1 = None
         self.team2 = None
+        self.profiler = profiler
+        self.cache = cache
+        self.log = log
 
     def commence_battle(self) -> Trainer | None:
         """
@@ -41,6 +52,38 @@ class Battle:
             Best case O(1), will only happen when both team is empty (impossible)
             Worst case O(n^2), will happen when both team is full of Pokemon (should always happen)
         """
+        if self.cache is not None and self.log is None:
+            return self.cache.play(self, self._fight)
+        return self._fight()
+
+    def _fight(self) -> Trainer | None:
+        """
+        Fights the battle, with the log and the profiler attached when there are (a battle replayed by the cache is not profiled)
+
+        Returns: The trainer that won the battle, if it's a draw, None will be returned
+
+        Complexity: see commence_battle()
+        """
+        if self.profiler is None and self.log is None:
+            return self._commence_battle()
+        with ExitStack() as attached:
+            if self.log is not None:
+                attached.enter_context(self.log.attach(self))
+            if self.profiler is not None:
+                attached.enter_context(self.profiler.attach(self))
+            winner = self._commence_battle()
+        if self.log is not None:
+            self.log.end(0 if winner is None else 1 if winner is self.trainer_1 else 2)
+        return winner
+
+    def _commence_battle(self) -> Trainer | None:
+        """
+        The battle itself, see commence_battle()
+
+        Returns: The trainer that won the battle, if it's a draw, None will be returned
+
+        Complexity: see commence_battle()
+        """
         winning_team = None
         if self.battle_mode.value == 0:
             winning_team = self.set_battle()
@@ -92,7 +135,15 @@ class Battle:
             p2 = self.team2.peek()
             self.trainer_1.register_pokemon(p2)
             self.trainer_2.register_pokemon(p1)
-            p1_alive, p2_alive = self.actual_battle(p1, p2)  # battle between two Pokemon, will return boolean
+            result = None
+            if self.matchups is not None and self.profiler is None and self.log is None:
+                result = self.matchups.duel(self, p1, p2)  # the whole duel at once, None when the matrix does not cover it
+            if result is not None:
+                p1_alive, p2_alive = result
+            else:
+                p1_alive, p2_alive = self.actual_battle(p1, p2)  # battle between two Pokemon, will return boolean
+            if result is None and p1_alive and p2_alive and self.FAST_FORWARD and self.profiler is None and self.log is None:
+                self.fast_forward(p1, p2)  # the same two Pokemon fight again, skip the exchanges nobody can faint in
             if p1_alive is False:
                 self.team1.pop()
             if p2_alive is False:
@@ -104,6 +155,41 @@ class Battle:
         elif self.team2.is_empty():
             return self.team1
 
+    def fast_forward(self, p1, p2) -> int:
+        """
+        Plays at once the coming exchanges of a SET duel in which neither Pokemon can faint
+
+        While both survive, an exchange takes the same health from each Pokemon every time: the damage only depends on
+        stats, types and the pokedex completions, stats only change on a level up (which needs a faint) and both
+        Pokemon have just been registered, so the completions cannot change either. An exchange in which nobody faints
+        takes damage + 1 (both_minus_one) from each, so the number of such exchanges is computed with exact fractions
+        and their health is taken away in one subtraction. This is only done when every value is a multiple of 2^-12
+        below 2^40, where float arithmetic is exact, so the health is bit for bit what the exchanges would have left;
+        otherwise, or if a front is somehow not registered, nothing is skipped and the duel goes on exchange by exchange.
+        The exchange that ends the duel is always played by actual_battle().
+
+        param arg1: Pokemon by first trainer, alive
+        param arg2: Pokemon by second trainer, alive
+
+        Returns: the number of exchanges skipped
+
+        Complexity: O(1) for both best and worst case
+        """
+        if p2.poketype.value + 1 not in self.trainer_1.registered_types or p1.poketype.value + 1 not in self.trainer_2.registered_types:
+            return 0
+        damage1 = ceil(p1.attack(p2) * Trainer.completion_ratio(self.trainer_1.registered_count, self.trainer_2.registered_count))
+        damage2 = ceil(p2.attack(p1) * Trainer.completion_ratio(self.trainer_2.registered_count, self.trainer_1.registered_count))
+        lost2 = (damage1 / 2 if damage1 < p2.get_defence() else damage1) + 1
+        lost1 = (damage2 / 2 if damage2 < p1.get_defence() else damage2) + 1
+        if not all(abs(x) < 2 ** 40 and (x * 4096) % 1 == 0 for x in (p1.health, p2.health, lost1, lost2)):
+            return 0
+        # exchanges left while health - lost stays above 0, i.e. ceil(health / lost) - 1
+        rounds = min(-(-Fraction(p1.health) // Fraction(lost1)), -(-Fraction(p2.health) // Fraction(lost2))) - 1
+        if rounds > 0:
+            p1.health -= rounds * lost1
+            p2.health -= rounds * lost2
+        return max(rounds, 0)
+
     def rotate_battle(self) -> PokeTeam | None:
         """
         When battle_mode is 1, Pokemon will fight a round, then send to the back of the team if they're still alive
@@ -173,9 +259,9 @@ class Battle:
         Complexity: Both best and worst case is O(n)
         """
         if p1.get_speed() == p2.get_speed():  # when both Pokemon have the same speed
-            attack_damage = ceil(p1.attack(p2) * (self.trainer_1.get_pokedex_completion()/self.trainer_2.get_pokedex_completion()))
+            attack_damage = ceil(p1.attack(p2) * Trainer.completion_ratio(self.trainer_1.registered_count, self.trainer_2.registered_count))
             p2.defend(attack_damage)
-            attack_damage = ceil(p2.attack(p1) * (self.trainer_2.get_pokedex_completion() / self.trainer_1.get_pokedex_completion()))
+            attack_damage = ceil(p2.attack(p1) * Trainer.completion_ratio(self.trainer_2.registered_count, self.trainer_1.registered_count))
             p1.defend(attack_damage)
             if p1.is_alive() and p2.is_alive():
                 self.both_minus_one(p1, p2)
@@ -202,13 +288,13 @@ class Battle:
         param arg4: The trainer of the slower speed Pokemon
 
         Complexity:
-            Complexity for .get_pokedex_completion() is guaranteed to be O(n) at this point
+            The pokedex completions are scaled with a single Trainer.completion_ratio() lookup
             O(n) for both best and worst case
         """
-        attack_damage = ceil(attacker.attack(defender) * (attacking_dex.get_pokedex_completion() / defending_dex.get_pokedex_completion()))
+        attack_damage = ceil(attacker.attack(defender) * Trainer.completion_ratio(attacking_dex.registered_count, defending_dex.registered_count))
         defender.defend(attack_damage)
         if defender.is_alive():
-            attack_damage = ceil(defender.attack(attacker) * (defending_dex.get_pokedex_completion() / attacking_dex.get_pokedex_completion()))
+            attack_damage = ceil(defender.attack(attacker) * Trainer.completion_ratio(defending_dex.registered_count, attacking_dex.registered_count))
             attacker.defend(attack_damage)
             if attacker.is_alive():
                 self.both_minus_one(attacker, defender)
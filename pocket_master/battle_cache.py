@@ -0,0 +1,172 @@
+"""
+This module contains BattleCache, a size bounded LRU cache of battle outcomes keyed on the state of both trainers
+"""
+
+__author__ = "Teh Yee Hong"
+
+from collections import OrderedDict
+from pokemon_base import Pokemon
+from data_structures.queue_adt import CircularQueue
+
+STATE = tuple(name for name in Pokemon.__slots__ if name != "evolution_line")
+
+
+def pokemon_state(pokemon: Pokemon) -> tuple:
+    """
+    Returns: everything a battle reads or writes on a Pokemon, its class stands for its evolution_line
+
+    Complexity: O(1)
+    """
+    return (pokemon.get_species(),) + tuple([getattr(pokemon, name) for name in STATE])
+
+
+def members(battle_team) -> list:
+    """
+    Returns: the Pokemon of a battle_team, bottom to top for a stack and front to rear for a queue
+
+    Complexity: O(n), n is the number of Pokemon in the battle_team
+    """
+    if isinstance(battle_team, CircularQueue):
+        capacity = len(battle_team.array)
+        return [battle_team.array[(battle_team.front + i) % capacity] for i in range(len(battle_team))]
+    return [battle_team.array[i] for i in range(len(battle_team))]
+
+
+def rebuild(battle_team, pokemon: list) -> None:
+    """
+    Empties a battle_team and puts the Pokemon back in, in the order of members()
+
+    Complexity: O(n), n is the number of Pokemon
+    """
+    battle_team.clear()
+    add = battle_team.append if isinstance(battle_team, CircularQueue) else battle_team.push
+    for x in pokemon:
+        add(x)
+
+
+class BattleCache:
+    """
+    Remembers the outcome of battles, so a battle between trainers in a state already seen is replayed instead of fought.
+
+    A battle is deterministic given the state of every Pokemon in both battle_teams (in order), the battle mode,
+    the criterion (only read in optimise mode) and the types each trainer has registered (the BSet bit mask is canonical),
+    so these make the key. The entry keeps the winner, the final state of every Pokemon that took part,
+    the final order of both battle_teams and the types each trainer registered during the battle, in order.
+    Replaying writes all of it back onto the trainers, which leaves them as the fought battle would have.
+
+    At most max_entries outcomes are kept, the least recently used one is dropped first.
+    """
+
+    def __init__(self, max_entries: int = 4096) -> None:
+        """
+        Initializing a new instance of BattleCache
+
+        param arg1: the number of outcomes kept at most
+        """
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, battle) -> tuple:
+        """
+        Returns: the canonical key of a battle whose teams are created, see the class docstring
+
+        Complexity: O(n), n is the number of Pokemon in both battle_teams
+        """
+        criterion = battle.criterion if battle.battle_mode.value == 2 else None
+        return (battle.battle_mode.value, criterion,
+                tuple([pokemon_state(x) for x in members(battle.team1)]),
+                tuple([pokemon_state(x) for x in members(battle.team2)]),
+                battle.trainer_1.registered_types.elems, battle.trainer_2.registered_types.elems)
+
+    def play(self, battle, fight):
+        """
+        Returns the winner of a battle, replayed from the cache or fought with fight() and remembered
+
+        param arg1: the Battle, with its teams created
+        param arg2: plays the battle for real and returns the winning Trainer or None
+
+        Returns: The trainer that won the battle, if it's a draw, None will be returned
+
+        Complexity:
+            Best case O(n), a hit, n is the number of Pokemon in both battle_teams
+            Worst case O(n) plus the battle itself, a miss
+        """
+        key = self.key(battle)
+        team1, team2 = members(battle.team1), members(battle.team2)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            self._replay(battle, team1, team2, entry)
+            return (None, battle.trainer_1, battle.trainer_2)[entry[0]]
+
+        self.misses += 1
+        count1, count2 = battle.trainer_1.registered_count, battle.trainer_2.registered_count
+        winner = fight()
+        positions1 = {id(x): i for i, x in enumerate(team1)}
+        positions2 = {id(x): i for i, x in enumerate(team2)}
+        self.entries[key] = (0 if winner is None else 1 if winner is battle.trainer_1 else 2,
+                             tuple([pokemon_state(x)[1:] for x in team1]), tuple([pokemon_state(x)[1:] for x in team2]),
+                             tuple([positions1[id(x)] for x in members(battle.team1)]),
+                             tuple([positions2[id(x)] for x in members(battle.team2)]),
+                             tuple([battle.trainer_1.poketypedex[i] for i in range(count1, battle.trainer_1.registered_count)]),
+                             tuple([battle.trainer_2.poketypedex[i] for i in range(count2, battle.trainer_2.registered_count)]))
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        return winner
+
+    def _replay(self, battle, team1: list, team2: list, entry: tuple) -> None:
+        """
+        Writes the final state of a remembered battle back onto its trainers
+
+        Complexity: O(n), n is the number of Pokemon in both battle_teams
+        """
+        _, states1, states2, order1, order2, registered1, registered2 = entry
+        for team, states in ((team1, states1), (team2, states2)):
+            for x, state in zip(team, states):
+                for name, value in zip(STATE, state):
+                    setattr(x, name, value)
+        rebuild(battle.team1, [team1[i] for i in order1])
+        rebuild(battle.team2, [team2[i] for i in order2])
+        for trainer, registered in ((battle.trainer_1, registered1), (battle.trainer_2, registered2)):
+            for poketype in registered:
+                trainer.registered_types.add(poketype.value + 1)
+                trainer.poketypedex[trainer.registered_count] = poketype
+                trainer.registered_count += 1
+
+    def clear(self) -> None:
+        """
+        Forgets every outcome and resets the counters
+
+        Complexity: O(1)
+        """
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def hit_rate(self) -> float:
+        """
+        Returns: the share of battles replayed from the cache, 0.0 before any battle
+
+        Complexity: O(1)
+        """
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        """
+        Returns: the hits, misses, evictions, hit rate and number of entries of the cache
+
+        Complexity: O(1)
+        """
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "hit_rate": self.hit_rate(), "entries": len(self.entries), "max_entries": self.max_entries}
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,353 @@
+"""
+This module contains BattleLog, which records the events of battles as fixed-width binary records,
+and BattleReplay, which reads them back and rebuilds the state of a battle at any event
+"""
+
+__author__ = "Teh Yee Hong"
+
+import os
+import re
+import struct
+from contextlib import contextmanager
+from pokemon_base import AbstractPokemon, Pokemon, PokeType
+from poke_team import Trainer, PokeTeam
+from battle_mode import BattleMode
+from battle_cache import members
+
+MAGIC = b"PKBL"
+VERSION = 1
+HEADER = struct.Struct("<4sHH")
+# battle number, kind, side (1 or 2, 0 when neither), slot of the Pokemon in its side, extra, value
+RECORD = struct.Struct("<IBBBBd")
+
+START, POKEMON, STAT, REGISTER, ATTACK, DAMAGE, ATTRITION, FAINT, LEVEL_UP, EVOLVE, END = range(11)
+KINDS = ("start", "pokemon", "stat", "register", "attack", "damage", "attrition", "faint", "level_up", "evolve", "end")
+# the stat ids of STAT records, a POKEMON record is followed by one STAT record for each of them
+STATS = ("health", "max_hp", "level", "experience", "battle_power", "defence", "speed", "evolution_stage")
+EVOLVED_STATS = ("health", "battle_power", "speed", "defence")
+INT_STATS = ("level", "experience", "evolution_stage")
+
+_species_index = {}
+
+
+def species_index(cls) -> int:
+    """
+    Returns: the position of a species class in Pokemon.species(), which is what POKEMON records store
+
+    Complexity: O(1), after the first call
+    """
+    if not _species_index:
+        _species_index.update({species: i for i, species in enumerate(Pokemon.species())})
+    return _species_index[cls]
+
+
+class BattleLog:
+    """
+    Append-only event stream of the battles it is attached to.
+
+    Battle(..., log=BattleLog(path)) attaches the log for the length of commence_battle(), the same way a
+    BattleProfiler is attached: AbstractPokemon.attack, defend and level_up and Trainer.register_pokemon are wrapped on their
+    classes and Battle.both_minus_one on the battle, and everything is restored when the battle is over.
+    Only the Pokemon in both battle_teams when the battle starts are followed, each by its side and its slot
+    (its position in battle_cache.members() of the battle_team).
+
+    A battle is written as START, then POKEMON and its STAT records for every Pokemon, REGISTER for the types
+    already registered, the events in the order they happened and END. Health is recorded as the value after the event,
+    never as a difference, so a replay is exact. Every record is RECORD.size bytes, the file only starts with a HEADER.
+    """
+
+    def __init__(self, path: str = None) -> None:
+        """
+        Initializing a new instance of BattleLog
+
+        param arg1: the file the records are appended to after every battle, kept in memory only when not given
+        """
+        self.path = path
+        self.buffer = bytearray()
+        self.battles = 0
+        if path is not None and os.path.exists(path) and os.path.getsize(path) > HEADER.size:
+            with open(path, "rb") as file:
+                file.seek(-RECORD.size, os.SEEK_END)
+                self.battles = RECORD.unpack(file.read(RECORD.size))[0] + 1
+        self._battle = 0
+        self._slots = {}
+        self._sides = {}
+        self._attacker = None
+
+    def emit(self, kind: int, side: int = 0, slot: int = 0, extra: int = 0, value: float = 0.0) -> None:
+        """
+        Appends one record of the current battle
+
+        Complexity: O(1)
+        """
+        self.buffer += RECORD.pack(self._battle, kind, side, slot, extra, value)
+
+    def _emit_stats(self, pokemon, names) -> None:
+        side, slot = self._slots[id(pokemon)]
+        for name in names:
+            self.emit(STAT, side, slot, STATS.index(name), getattr(pokemon, name))
+
+    @contextmanager
+    def attach(self, battle):
+        """
+        Records the battle fought in the with block, see the class docstring
+
+        param arg1: the Battle to record, with its teams created
+
+        Complexity: O(n) for both best and worst case, n is the number of Pokemon in both battle_teams
+        """
+        self._battle = self.battles
+        self._slots = {}
+        self._sides = {id(battle.trainer_1): 1, id(battle.trainer_2): 2}
+        self._attacker = None
+        criterion = PokeTeam.CRITERION_LIST.index(battle.criterion) if battle.criterion in PokeTeam.CRITERION_LIST else -1
+        self.emit(START, 0, 0, battle.battle_mode.value, criterion)
+        for side, trainer, team in ((1, battle.trainer_1, battle.team1), (2, battle.trainer_2, battle.team2)):
+            for slot, pokemon in enumerate(members(team)):
+                self._slots[id(pokemon)] = (side, slot)
+                self.emit(POKEMON, side, slot, species_index(pokemon.get_species()))
+                self._emit_stats(pokemon, STATS)
+            for i in range(trainer.registered_count):
+                self.emit(REGISTER, side, 0, trainer.poketypedex[i].value)
+
+        originals = [(AbstractPokemon, "attack"), (AbstractPokemon, "defend"), (AbstractPokemon, "level_up"), (Trainer, "register_pokemon")]
+        originals = [(cls, name, cls.__dict__[name]) for cls, name in originals]
+        attack, defend, level_up, register_pokemon = [original for _, _, original in originals]
+        both_minus_one = battle.both_minus_one
+        log, slots = self, self._slots
+
+        def logged_attack(pokemon, other_pokemon):
+            log._attacker = pokemon
+            return attack(pokemon, other_pokemon)
+
+        def logged_defend(pokemon, damage):
+            defend(pokemon, damage)
+            if id(pokemon) in slots:
+                side, slot = slots[id(pokemon)]
+                attacker = slots.get(id(log._attacker), (0, 0))[1]
+                log.emit(ATTACK, 3 - side, attacker, slot, damage)
+                log.emit(DAMAGE, side, slot, 0, pokemon.health)
+                if not pokemon.is_alive():
+                    log.emit(FAINT, side, slot)
+
+        def logged_level_up(pokemon):
+            stage = pokemon.evolution_stage
+            level_up(pokemon)
+            if id(pokemon) in slots:
+                side, slot = slots[id(pokemon)]
+                log.emit(LEVEL_UP, side, slot, 0, pokemon.level)
+                if pokemon.evolution_stage != stage:
+                    log.emit(EVOLVE, side, slot, pokemon.evolution_stage)
+                    log._emit_stats(pokemon, EVOLVED_STATS)
+
+        def logged_register_pokemon(trainer, pokemon):
+            count = trainer.registered_count
+            register_pokemon(trainer, pokemon)
+            if trainer.registered_count != count and id(trainer) in log._sides:
+                log.emit(REGISTER, log._sides[id(trainer)], 0, trainer.poketypedex[count].value)
+
+        def logged_both_minus_one(p1, p2):
+            for pokemon in (p1, p2):
+                side, slot = slots[id(pokemon)]
+                log.emit(ATTRITION, side, slot, 0, pokemon.health - 1)
+            for pokemon in (p1, p2):
+                if pokemon.health - 1 <= 0:
+                    log.emit(FAINT, *slots[id(pokemon)])
+            both_minus_one(p1, p2)
+
+        try:
+            for (cls, name, _), function in zip(originals, (logged_attack, logged_defend, logged_level_up, logged_register_pokemon)):
+                setattr(cls, name, function)
+            battle.both_minus_one = logged_both_minus_one
+            yield self
+        finally:
+            for cls, name, original in originals:
+                setattr(cls, name, original)
+            battle.__dict__.pop("both_minus_one", None)
+
+    def end(self, winner: int) -> None:
+        """
+        Closes the current battle with its END record and appends the battle to the file, if there is one
+
+        param arg1: 1 or 2 for the winning side, 0 for a draw
+
+        Complexity: O(n), n is the number of records of the battle
+        """
+        self.emit(END, winner)
+        self.battles += 1
+        if self.path is not None:
+            new = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+            with open(self.path, "ab") as file:
+                if new:
+                    file.write(HEADER.pack(MAGIC, VERSION, RECORD.size))
+                file.write(self.buffer)
+            self.buffer = bytearray()
+
+    def getvalue(self) -> bytes:
+        """
+        Returns: the whole log of a log kept in memory, in the format of the file
+
+        Complexity: O(n), n is the number of records
+        """
+        return HEADER.pack(MAGIC, VERSION, RECORD.size) + bytes(self.buffer)
+
+
+class PokemonState:
+    """
+    The state of one Pokemon in a replay
+    """
+
+    def __init__(self, species) -> None:
+        """
+        param arg1: the species class of the Pokemon
+        """
+        pokemon = species()
+        self.species = species
+        self.evolution_line = pokemon.evolution_line
+        self.first_name = pokemon.name
+        self.fainted = False
+        for name in STATS:
+            setattr(self, name, 0)
+
+    def get_name(self) -> str:
+        """
+        Returns: the name of the Pokemon at its evolution stage
+
+        Complexity: O(1)
+        """
+        if self.evolution_stage == 0:
+            return self.first_name
+        return self.evolution_line[self.evolution_line.index(self.first_name) + self.evolution_stage]
+
+    def __repr__(self) -> str:
+        return f"{self.get_name()} (Level {self.level}) with {self.health} health"
+
+
+class BattleState:
+    """
+    The state of a battle in a replay, after some of its events
+    """
+
+    def __init__(self) -> None:
+        self.battle_mode = None
+        self.criterion = None
+        self.sides = ([], [])
+        self.poketypedex = ([], [])
+        self.winner = None
+        self.ended = False
+
+    def apply(self, kind: int, side: int, slot: int, extra: int, value: float) -> None:
+        """
+        Applies one record
+
+        Complexity: O(1)
+        """
+        if kind == START:
+            self.battle_mode = BattleMode(extra)
+            self.criterion = PokeTeam.CRITERION_LIST[int(value)] if value >= 0 else None
+        elif kind == POKEMON:
+            self.sides[side - 1].append(PokemonState(Pokemon.species()[extra]))
+        elif kind == STAT:
+            name = STATS[extra]
+            setattr(self.sides[side - 1][slot], name, int(value) if name in INT_STATS else value)
+        elif kind == REGISTER:
+            self.poketypedex[side - 1].append(PokeType(extra))
+        elif kind == DAMAGE or kind == ATTRITION:
+            self.sides[side - 1][slot].health = value
+        elif kind == FAINT:
+            self.sides[side - 1][slot].fainted = True
+        elif kind == LEVEL_UP:
+            self.sides[side - 1][slot].level = int(value)
+        elif kind == EVOLVE:
+            self.sides[side - 1][slot].evolution_stage = extra
+        elif kind == END:
+            self.winner = side if side else None
+            self.ended = True
+
+    def get_pokedex_completion(self, side: int) -> float:
+        """
+        Returns: the pokedex completion of a side, as Trainer.get_pokedex_completion() computes it
+
+        Complexity: O(1)
+        """
+        return round(len(self.poketypedex[side - 1]) / len(PokeType), 2)
+
+
+class BattleReplay:
+    """
+    Reads a BattleLog file (or its bytes) and rebuilds battles from it.
+
+    Opening the log only finds where every battle starts, with one regular expression over the kind bytes of the
+    records, so a battle is reached without decoding the records before it.
+    """
+
+    def __init__(self, source) -> None:
+        """
+        param arg1: the path of a log file, or the bytes of a log
+
+        Raises:
+            ValueError: when it is not a battle log of this version
+        """
+        if isinstance(source, (bytes, bytearray)):
+            data = bytes(source)
+        else:
+            with open(source, "rb") as file:
+                data = file.read()
+        if len(data) < HEADER.size:
+            raise ValueError("not a battle log")
+        magic, version, record_size = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION or record_size != RECORD.size or (len(data) - HEADER.size) % RECORD.size:
+            raise ValueError("not a battle log of version " + str(VERSION))
+        self.data = memoryview(data)[HEADER.size:]
+        kinds = data[HEADER.size + 4::RECORD.size]
+        self.starts = [match.start() for match in re.finditer(re.escape(bytes([START])), kinds)]
+        self.ends = self.starts[1:] + [len(kinds)]
+
+    def __len__(self) -> int:
+        """
+        Returns: the number of battles in the log
+
+        Complexity: O(1)
+        """
+        return len(self.starts)
+
+    def events(self, battle: int):
+        """
+        Yields the records of a battle, as (kind name, side, slot, extra, value)
+
+        param arg1: the position of the battle in the log
+
+        Complexity: O(n), n is the number of records of the battle
+        """
+        records = self.data[self.starts[battle] * RECORD.size:self.ends[battle] * RECORD.size]
+        for _, kind, side, slot, extra, value in RECORD.iter_unpack(records):
+            yield KINDS[kind], side, slot, extra, value
+
+    def battle_number(self, battle: int) -> int:
+        """
+        Returns: the number the BattleLog gave to the battle at this position
+
+        Complexity: O(1)
+        """
+        return RECORD.unpack_from(self.data, self.starts[battle] * RECORD.size)[0]
+
+    def state(self, battle: int, upto: int = None) -> BattleState:
+        """
+        Rebuilds the state of a battle
+
+        param arg1: the position of the battle in the log
+        param arg2: the number of records to apply, the whole battle when not given
+
+        Returns: the BattleState after those records
+
+        Complexity: O(n), n is the number of records applied
+        """
+        end = self.ends[battle] if upto is None else min(self.ends[battle], self.starts[battle] + upto)
+        state = BattleState()
+        for _, kind, side, slot, extra, value in RECORD.iter_unpack(self.data[self.starts[battle] * RECORD.size:end * RECORD.size]):
+            state.apply(kind, side, slot, extra, value)
+        return state
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,445 @@
+"""
+This module contains BattleService, an asyncio server playing battles in a process pool, and BattleClient with a load generator
+
+Usage (from the pocket_master directory):
+    python battle_service.py serve --port 8765
+    python battle_service.py load --port 8765 --requests 5000 --concurrency 128
+"""
+
+__author__ = "Teh Yee Hong"
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import time
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pokemon import get_all_pokemon_types
+from poke_team import Trainer, PokeTeam
+from battle import Battle
+from battle_mode import BattleMode
+from data_structures.referential_array import ArrayR
+from rng import StreamRandom
+
+logger = logging.getLogger(__name__)
+_species = {}
+
+
+def species_by_name() -> dict:
+    """
+    Returns: every species class by its class name
+
+    Complexity: O(1), after the first call
+    """
+    if not _species:
+        _species.update({cls.__name__: cls for cls in get_all_pokemon_types()})
+    return _species
+
+
+def build_trainer(name: str, species_names: list) -> Trainer:
+    """
+    Builds a trainer whose team is the given species, in order, as PokeTeam.choose_manually() would, and registers them
+
+    param arg1: the name of the trainer
+    param arg2: the class names of the Pokemon, between 1 and PokeTeam.TEAM_LIMIT of them
+
+    Returns: the Trainer
+
+    Raises:
+        ValueError: when the team is empty, too large or names an unknown species
+
+    Complexity: O(n) for both best and worst case, n is the number of Pokemon
+    """
+    if not 0 < len(species_names) <= PokeTeam.TEAM_LIMIT:
+        raise ValueError(f"a team has between 1 and {PokeTeam.TEAM_LIMIT} Pokemon")
+    species = species_by_name()
+    trainer = Trainer(name)
+    team = trainer.get_team()
+    team.team = ArrayR(PokeTeam.TEAM_LIMIT)
+    for i, species_name in enumerate(species_names):
+        if species_name not in species:
+            raise ValueError("unknown species " + str(species_name))
+        pokemon = species[species_name]()
+        pokemon.set_max_hp()
+        team.team[i] = pokemon
+    team.team_count = len(species_names)
+    team.battle_team = team.team
+    for pokemon in team._alive():
+        trainer.register_pokemon(pokemon)
+    return trainer
+
+
+def play(request: dict) -> dict:
+    """
+    Plays one battle request
+
+    param arg1: {"id", "team1": [class names], "team2": [class names], "mode": "SET" | "ROTATE" | "OPTIMISE" or its value,
+                 "criterion" (optional, "health" by default), "name1" and "name2" (optional)}
+
+    Returns: {"id", "winner": name or None for a draw, "completion1", "completion2", "team1", "team2"},
+             the teams being what is left of them, or {"id", "error"} when the request is not valid
+
+    Complexity: the complexity of Battle.commence_battle()
+    """
+    try:
+        mode = request.get("mode", "SET")
+        battle_mode = BattleMode[mode] if isinstance(mode, str) else BattleMode(mode)
+        criterion = request.get("criterion", "health")
+        if criterion not in PokeTeam.CRITERION_LIST:
+            raise ValueError("unknown criterion " + str(criterion))
+        trainer_1 = build_trainer(request.get("name1", "Trainer 1"), request["team1"])
+        trainer_2 = build_trainer(request.get("name2", "Trainer 2"), request["team2"])
+    except (KeyError, ValueError, TypeError) as error:
+        return {"id": request.get("id"), "error": f"{type(error).__name__}: {error}"}
+    battle = Battle(trainer_1, trainer_2, battle_mode, criterion)
+    battle._create_teams()
+    winner = battle.commence_battle()
+    return {"id": request.get("id"), "winner": None if winner is None else winner.get_name(),
+            "completion1": trainer_1.get_pokedex_completion(), "completion2": trainer_2.get_pokedex_completion(),
+            "team1": [str(x) for x in trainer_1.get_team()._alive()], "team2": [str(x) for x in trainer_2.get_team()._alive()]}
+
+
+def play_batch(requests: list) -> list:
+    """
+    Plays a batch of requests in a worker, so a single round trip to the pool carries many battles.
+    A request whose battle fails gets an {"id", "error"} response, the other requests of the batch are still played
+
+    Complexity: O(n) calls to play(), n is the number of requests
+    """
+    responses = []
+    for request in requests:
+        try:
+            responses.append(play(request))
+        except Exception as error:
+            responses.append({"id": request.get("id"), "error": f"{type(error).__name__}: {error}"})
+    return responses
+
+
+class BattleService:
+    """
+    Serves battles over a local TCP socket, one JSON request per line and one JSON response per line.
+
+    Requests of every connection go through one queue, a batcher takes up to batch_size of them (waiting at most
+    batch_delay seconds for a batch to fill) and hands the batch to the process pool, several batches can be in the
+    pool at once. Responses are written back as soon as their batch is done, so on a connection with several requests in
+    flight they may come back in a different order, the "id" of the request is copied into its response.
+    Battle and Trainer are used as they are, play() builds and fights them exactly like a caller would.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8765, workers: int = None,
+                 batch_size: int = 32, batch_delay: float = 0.002) -> None:
+        """
+        Initializing a new instance of BattleService
+
+        param arg1: the address to listen on
+        param arg2: the port to listen on, 0 for any free port
+        param arg3: the number of worker processes, None for one per CPU, 0 to play in a thread of this process
+        param arg4: the number of requests per batch at most
+        param arg5: how long a batch waits for more requests, in seconds
+        """
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.server = None
+        self.executor = None
+        self.queue = None
+        self.batcher = None
+        self.playing = set()
+        self.requests = 0
+        self.batches = 0
+
+    async def start(self) -> tuple:
+        """
+        Starts listening and batching
+
+        Returns: the (host, port) the service listens on
+
+        Complexity: O(1)
+        """
+        self.executor = ThreadPoolExecutor(1) if self.workers == 0 else ProcessPoolExecutor(self.workers)
+        self.queue = asyncio.Queue()
+        self.batcher = asyncio.create_task(self._batch())
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self) -> None:
+        """
+        Starts the service if needed and serves until cancelled
+        """
+        if self.server is None:
+            await self.start()
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self) -> None:
+        """
+        Stops listening, batching and the pool, batches still being played are cancelled
+        """
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.batcher is not None:
+            self.batcher.cancel()
+        for task in self.playing:
+            task.cancel()
+        if self.executor is not None:
+            # shutting the pool down waits for its workers, which must not block the event loop
+            await asyncio.get_running_loop().run_in_executor(None, partial(self.executor.shutdown, cancel_futures=True))
+        self.server = self.batcher = self.executor = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Reads the requests of one connection and writes their responses as they come.
+        A line longer than the limit of the reader is answered with an error and ends the connection, as the requests
+        after it cannot be told apart reliably. A response that cannot be written (the client went away) closes the
+        connection, the responses after it are dropped
+        """
+        lock = asyncio.Lock()
+        pending = set()
+        peer = writer.get_extra_info("peername")
+
+        async def respond(future) -> None:
+            response = await future
+            async with lock:
+                if writer.is_closing():
+                    return
+                try:
+                    writer.write(json.dumps(response).encode() + b"\n")
+                    await writer.drain()
+                except OSError as error:
+                    logger.warning("cannot answer %s, closing the connection: %s", peer, error)
+                    writer.close()
+
+        def answer(future) -> None:
+            task = asyncio.create_task(respond(future))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+        try:
+            while True:
+                future = asyncio.get_running_loop().create_future()
+                try:
+                    line = await reader.readline()
+                except ValueError as error:
+                    logger.warning("request of %s over the line limit, closing the connection: %s", peer, error)
+                    future.set_result({"id": None, "error": f"{type(error).__name__}: {error}"})
+                    answer(future)
+                    break
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("a request is a JSON object")
+                except ValueError as error:
+                    future.set_result({"id": None, "error": f"{type(error).__name__}: {error}"})
+                else:
+                    self.requests += 1
+                    self.queue.put_nowait((request, future))
+                answer(future)
+            if pending:
+                await asyncio.gather(*pending)
+        except ConnectionError as error:
+            logger.info("connection of %s lost: %s", peer, error)
+        finally:
+            writer.close()
+
+    async def _batch(self) -> None:
+        """
+        Takes batches from the queue and sends them to the pool, forever
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.batch_delay
+            while len(batch) < self.batch_size:
+                if not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            self.batches += 1
+            task = asyncio.create_task(self._play(batch))
+            self.playing.add(task)  # the event loop only keeps weak references to its tasks
+            task.add_done_callback(self.playing.discard)
+
+    async def _play(self, batch: list) -> None:
+        """
+        Plays one batch in the pool and resolves the futures of its requests
+        """
+        try:
+            responses = await asyncio.get_running_loop().run_in_executor(self.executor, play_batch, [request for request, _ in batch])
+        except Exception as error:
+            responses = [{"id": request.get("id"), "error": f"{type(error).__name__}: {error}"} for request, _ in batch]
+        for (_, future), response in zip(batch, responses):
+            if not future.done():
+                future.set_result(response)
+
+
+class BattleClient:
+    """
+    Client of a BattleService over one connection, any number of battles can be in flight at once
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8765) -> None:
+        """
+        param arg1: the address of the service
+        param arg2: the port of the service
+        """
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+        self.waiting = {}
+        self.ids = itertools.count()
+        self.listener = None
+        self.error = None
+
+    async def connect(self) -> None:
+        """
+        Opens the connection
+        """
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.listener = asyncio.create_task(self._listen())
+
+    async def close(self) -> None:
+        """
+        Closes the connection, battles still in flight are cancelled
+        """
+        self.listener.cancel()
+        self.writer.close()
+        await self.writer.wait_closed()
+        for future in self.waiting.values():
+            future.cancel()
+        self.waiting.clear()
+
+    async def _listen(self) -> None:
+        """
+        Resolves the future of every response, a response that is not valid JSON or answers no battle in flight
+        (and the service closing the connection) fails every battle in flight, as nothing can be trusted on the
+        connection any more
+        """
+        try:
+            while line := await self.reader.readline():
+                response = json.loads(line)
+                request_id = response.get("id") if isinstance(response, dict) else None
+                future = self.waiting.pop(request_id, None)
+                if future is None:
+                    raise ValueError(f"response to no battle in flight: {line[:200]!r}")
+                if not future.done():
+                    future.set_result(response)
+            raise ConnectionError("the service closed the connection")
+        except (ValueError, ConnectionError) as error:
+            self.error = error
+            for future in self.waiting.values():
+                if not future.done():
+                    future.set_exception(error)
+            self.waiting.clear()
+
+    async def battle(self, team1: list, team2: list, mode: str = "SET", criterion: str = "health") -> dict:
+        """
+        Asks the service for one battle
+
+        param arg1: the class names of the first team
+        param arg2: the class names of the second team
+        param arg3: the name of the BattleMode
+        param arg4: the criterion
+
+        Returns: the response of the service, see play()
+
+        Raises:
+            ValueError, ConnectionError: when the connection failed, see _listen()
+        """
+        if self.error is not None:
+            raise self.error
+        request_id = next(self.ids)
+        future = asyncio.get_running_loop().create_future()
+        self.waiting[request_id] = future
+        request = {"id": request_id, "team1": team1, "team2": team2, "mode": mode, "criterion": criterion}
+        self.writer.write(json.dumps(request).encode() + b"\n")
+        await self.writer.drain()
+        return await future
+
+
+def random_request(rng: StreamRandom) -> tuple:
+    """
+    Returns: a random (team1, team2, mode, criterion) for BattleClient.battle()
+
+    Complexity: O(1)
+    """
+    names = sorted(species_by_name())
+    team1 = [rng.choice(names) for _ in range(PokeTeam.TEAM_LIMIT)]
+    team2 = [rng.choice(names) for _ in range(PokeTeam.TEAM_LIMIT)]
+    return team1, team2, rng.choice([mode.name for mode in BattleMode]), rng.choice(PokeTeam.CRITERION_LIST)
+
+
+async def load(host: str = "127.0.0.1", port: int = 8765, requests: int = 1000, concurrency: int = 64, seed: int = 0) -> dict:
+    """
+    Load generator: sends random battles with at most concurrency of them in flight and measures the latencies
+
+    param arg1: the address of the service
+    param arg2: the port of the service
+    param arg3: the number of battles
+    param arg4: the number of battles in flight at most
+    param arg5: the seed of the random battles
+
+    Returns: {"requests", "errors", "seconds", "throughput" (battles per second), "p50_ms", "p99_ms", "max_ms"}
+    """
+    rng = StreamRandom(seed)
+    battles = [random_request(rng) for _ in range(requests)]
+    client = BattleClient(host, port)
+    await client.connect()
+    slots = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(battle) -> None:
+        nonlocal errors
+        async with slots:
+            start = time.perf_counter()
+            response = await client.battle(*battle)
+            latencies.append(time.perf_counter() - start)
+            errors += "error" in response
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one(battle) for battle in battles])
+    seconds = time.perf_counter() - start
+    await client.close()
+    latencies.sort()
+
+    def percentile(p: float) -> float:
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000 if latencies else 0.0
+    return {"requests": requests, "errors": errors, "seconds": seconds, "throughput": requests / seconds if seconds else 0.0,
+            "p50_ms": percentile(0.5), "p99_ms": percentile(0.99), "max_ms": latencies[-1] * 1000 if latencies else 0.0}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog="python battle_service.py")
+    parser.add_argument("command", choices=["serve", "load"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=None, help="serve: worker processes, 0 to play in this process")
+    parser.add_argument("--batch-size", type=int, default=32, help="serve: requests per batch at most")
+    parser.add_argument("--requests", type=int, default=1000, help="load: number of battles")
+    parser.add_argument("--concurrency", type=int, default=64, help="load: battles in flight at most")
+    parser.add_argument("--seed", type=int, default=0, help="load: seed of the random battles")
+    args = parser.parse_args()
+    if args.command == "serve":
+        service = BattleService(args.host, args.port, args.workers, args.batch_size)
+        try:
+            asyncio.run(service.serve_forever())
+        except KeyboardInterrupt:
+            pass
+    else:
+        print(json.dumps(asyncio.run(load(args.host, args.port, args.requests, args.concurrency, args.seed)), indent=2))
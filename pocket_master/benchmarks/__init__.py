@@ -0,0 +1,3 @@
+"""
+Benchmarks for the hot paths of the game, run them from the pocket_master directory, e.g. python -m benchmarks.memory
+"""
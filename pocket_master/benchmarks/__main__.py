@@ -0,0 +1,4 @@
+import sys
+from benchmarks.suite import main
+
+sys.exit(main())
@@ -0,0 +1,129 @@
+"""
+Memory benchmark of a population of trainers, comparing the slotted classes with the same objects kept in a __dict__
+
+Usage (from the pocket_master directory):
+    python -m benchmarks.memory [--trainers 100000] [--seed 20]
+"""
+
+__author__ = "Teh Yee Hong"
+
+import argparse
+import random
+import tracemalloc
+from poke_team import Trainer, PokeTeam
+from pokemon_base import Pokemon
+from data_structures.sorted_list_adt import ListItem
+from data_structures.bset import BSet
+
+
+def slots_of(cls) -> tuple:
+    """
+    Returns every slot declared along the class hierarchy
+
+    Complexity: O(n), n is the depth of the hierarchy
+    """
+    slots = []
+    for klass in cls.__mro__:
+        slots.extend(getattr(klass, "__slots__", ()))
+    return tuple(slots)
+
+
+def object_sizes(obj, copies: int = 10000) -> tuple:
+    """
+    Measures with tracemalloc how much one copy of the object takes, and how much the same object takes
+    when its attributes live in an instance __dict__ as they did before __slots__
+    (the attribute values are shared by all the copies, so they are not counted in either)
+
+    Returns: (bytes per slotted object, bytes per object with a __dict__)
+
+    Complexity: O(n), n is the number of copies
+    """
+    cls = type(obj)
+    attributes = [(slot, getattr(obj, slot)) for slot in slots_of(cls) if hasattr(obj, slot)]
+    with_dict = type(cls.__name__, (), {})
+
+    def measure(make) -> float:
+        tracemalloc.start()
+        kept = [make() for _ in range(copies)]
+        traced, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del kept
+        return traced / copies
+
+    def make_slotted():
+        copy = cls.__new__(cls)
+        for name, value in attributes:
+            setattr(copy, name, value)
+        return copy
+
+    def make_with_dict():
+        copy = with_dict()
+        for name, value in attributes:
+            setattr(copy, name, value)
+        return copy
+
+    return round(measure(make_slotted)), round(measure(make_with_dict))
+
+
+def build_population(trainers: int, seed: int) -> list:
+    """
+    Creates trainers with a random team each
+
+    Complexity: O(n), n is the number of trainers
+    """
+    random.seed(seed)
+    population = []
+    for i in range(trainers):
+        trainer = Trainer(f"Trainer {i}")
+        trainer.pick_team("Random")
+        population.append(trainer)
+    return population
+
+
+def run(trainers: int, seed: int) -> dict:
+    """
+    Measures the population, per object for every slotted class and in total with tracemalloc
+
+    Returns: a dict with one entry per class (count, slotted bytes, dict bytes, saving) and the total traced memory
+
+    Complexity: O(n), n is the number of trainers
+    """
+    tracemalloc.start()
+    population = build_population(trainers, seed)
+    traced, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    sample = population[0]
+    samples = {
+        Trainer: (sample, trainers),
+        PokeTeam: (sample.team, trainers),
+        BSet: (sample.registered_types, trainers),
+        Pokemon: (sample.team.team[0], trainers * PokeTeam.TEAM_LIMIT),
+        ListItem: (ListItem(sample, 0), trainers),  # the one BattleTower keeps per trainer
+    }
+    report = {"trainers": trainers, "traced_bytes": traced, "classes": {}}
+    for cls, (obj, count) in samples.items():
+        slotted, with_dict = object_sizes(obj)
+        report["classes"][cls.__name__] = {
+            "count": count,
+            "slotted_bytes": slotted,
+            "dict_bytes": with_dict,
+            "saved_bytes": (with_dict - slotted) * count,
+        }
+    return report
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--trainers", type=int, default=100000, help="Size of the population.")
+    p.add_argument("--seed", type=int, default=20, help="Seed the teams are drawn from.")
+    args = p.parse_args()
+
+    result = run(args.trainers, args.seed)
+    print(f"{result['trainers']} trainers, {result['traced_bytes'] / 2 ** 20:.1f} MiB traced")
+    print(f"{'class':<10}{'objects':>10}{'slotted B':>11}{'dict B':>8}{'saved MiB':>11}")
+    total_saved = 0
+    for name, row in result["classes"].items():
+        total_saved += row["saved_bytes"]
+        print(f"{name:<10}{row['count']:>10}{row['slotted_bytes']:>11}{row['dict_bytes']:>8}{row['saved_bytes'] / 2 ** 20:>11.1f}")
+    print(f"{'total':<10}{'':>29}{total_saved / 2 ** 20:>11.1f}")
@@ -0,0 +1,266 @@
+"""
+Seeded micro and macro benchmarks of the hot paths, with a JSON report compared against a stored baseline
+
+Usage (from the pocket_master directory):
+    python -m benchmarks                       run everything and compare against benchmarks/baseline.json
+    python -m benchmarks --save-baseline       run everything and store the result as the new baseline
+    python -m benchmarks --only battle_set     run the benchmarks whose name starts with battle_set
+
+Every run also times calibrate(), a fixed loop of plain Python, and every benchmark is compared against the baseline
+by its time relative to that loop, so a baseline saved on one machine still holds on a faster or slower one. A
+baseline from another Python version, or one without relative times, is compared in seconds and should be saved again
+on the machine that checks it.
+"""
+
+__author__ = "Teh Yee Hong"
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+from typing import Callable, Dict
+from pokemon_base import PokeType, TypeEffectiveness
+from pokemon import get_all_pokemon_types
+from poke_team import Trainer, PokeTeam
+from battle import Battle
+from battle_mode import BattleMode
+from tower import BattleTower
+from matchup_matrix import MatchupMatrix
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+SEED = 20
+
+
+def bench_effectiveness(rounds: int) -> int:
+    """ TypeEffectiveness.get_effectiveness over every pair of types. """
+    total = 0.0
+    for _ in range(rounds):
+        for attack_type in PokeType:
+            for defend_type in PokeType:
+                total += TypeEffectiveness.get_effectiveness(attack_type, defend_type)
+    return int(total)
+
+
+def bench_attack(rounds: int) -> int:
+    """ Pokemon.attack between randomly drawn species. """
+    random.seed(SEED)
+    species = get_all_pokemon_types()
+    pairs = [(random.choice(species)(), random.choice(species)()) for _ in range(100)]
+    total = 0.0
+    for _ in range(rounds):
+        for attacker, defender in pairs:
+            total += attacker.attack(defender)
+    return int(total)
+
+
+def bench_assemble_team(battle_mode: BattleMode) -> Callable[[int], int]:
+    """ PokeTeam.assemble_team on freshly drawn teams in one battle mode. """
+    def bench(rounds: int) -> int:
+        random.seed(SEED)
+        checksum = 0
+        for _ in range(rounds):
+            team = PokeTeam()
+            team.choose_randomly()
+            team.assemble_team(battle_mode, "health")
+            checksum += len(team)
+        return checksum
+    return bench
+
+
+def bench_battle(battle_mode: BattleMode) -> Callable[[int], int]:
+    """ Battle.commence_battle between freshly drawn trainers in one battle mode. """
+    def bench(rounds: int) -> int:
+        random.seed(SEED)
+        checksum = 0
+        for i in range(rounds):
+            trainer_1, trainer_2 = Trainer("Gary"), Trainer("Ash")
+            battle = Battle(trainer_1, trainer_2, battle_mode, "health")
+            battle._create_teams()
+            winner = battle.commence_battle()
+            checksum += 0 if winner is None else 1 if winner is trainer_1 else 2
+        return checksum
+    return bench
+
+
+_MATRIX = {}  # the MatchupMatrix, opened by the first run of duel_matchups
+
+
+def bench_duel(matchups: bool) -> Callable[[int], int]:
+    """ SET battles between one fresh Pokemon each, looked up in the MatchupMatrix or played exchange by exchange. """
+    def bench(rounds: int) -> int:
+        random.seed(SEED)
+        last = len(get_all_pokemon_types()) - 1
+        checksum = 0
+        if matchups:
+            if "matrix" not in _MATRIX:
+                _MATRIX["matrix"] = MatchupMatrix.open()
+            _MATRIX["matrix"].enable()
+        try:
+            for _ in range(rounds):
+                trainer_1, trainer_2 = Trainer("Gary"), Trainer("Ash")
+                for trainer in (trainer_1, trainer_2):
+                    trainer.team.choose_by_index([random.randint(0, last)])
+                    trainer.register_team()
+                battle = Battle(trainer_1, trainer_2, BattleMode.SET)
+                battle._create_teams()
+                winner = battle.commence_battle()
+                checksum += 0 if winner is None else 1 if winner is trainer_1 else 2
+        finally:
+            MatchupMatrix.disable()
+        return checksum
+    return bench
+
+
+def bench_tower(rounds: int) -> int:
+    """ Whole BattleTower runs, until the challenger or the tower runs out. """
+    random.seed(SEED)
+    checksum = 0
+    for _ in range(rounds):
+        challenger = Trainer("Ash")
+        challenger.pick_team("Random")
+        challenger.get_team().assemble_team(BattleMode.ROTATE)
+        tower = BattleTower()
+        tower.set_my_trainer(challenger)
+        tower.generate_enemy_trainers(10)
+        while tower.battles_remaining():
+            tower.next_battle()
+        checksum += tower.enemies_defeated()
+    return checksum
+
+
+# name: (function, rounds per run), a function plays its rounds and returns a checksum of the work done
+BENCHMARKS: Dict[str, tuple] = {
+    "effectiveness": (bench_effectiveness, 200),
+    "attack": (bench_attack, 200),
+    "assemble_team_set": (bench_assemble_team(BattleMode.SET), 2000),
+    "assemble_team_rotate": (bench_assemble_team(BattleMode.ROTATE), 2000),
+    "assemble_team_optimise": (bench_assemble_team(BattleMode.OPTIMISE), 2000),
+    "battle_set": (bench_battle(BattleMode.SET), 300),
+    "battle_rotate": (bench_battle(BattleMode.ROTATE), 300),
+    "battle_optimise": (bench_battle(BattleMode.OPTIMISE), 300),
+    "duel": (bench_duel(False), 2000),
+    "duel_matchups": (bench_duel(True), 2000),
+    "tower": (bench_tower, 20),
+}
+
+
+def calibrate(repeat: int = 5) -> float:
+    """
+    Times a fixed loop of plain Python (arithmetic, a dict and a method call), the unit of the relative times
+
+    param arg1: number of runs, the fastest is kept
+
+    Returns: the seconds of the fastest run
+
+    Complexity: O(1), the loop is always the same
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        table = {}
+        total = 0
+        for i in range(200_000):
+            table[i & 255] = total
+            total += table.get(i & 127, i) % 7
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run(only: str = "", repeat: int = 5) -> dict:
+    """
+    Runs the benchmarks, every one is played repeat times and the fastest run is kept
+
+    param arg1: only the benchmarks whose name starts with it are run
+    param arg2: number of runs of every benchmark
+
+    Returns: the report, {"python": ..., "calibration": seconds of calibrate(),
+             "benchmarks": {name: {"rounds", "seconds", "relative" (seconds / calibration), "checksum"}}}
+
+    Complexity: O(n), n is the number of benchmarks
+    """
+    calibration = calibrate(repeat)
+    report = {"python": platform.python_version(), "calibration": calibration, "benchmarks": {}}
+    for name, (bench, rounds) in BENCHMARKS.items():
+        if not name.startswith(only):
+            continue
+        best = None
+        checksum = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            checksum = bench(rounds)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        report["benchmarks"][name] = {"rounds": rounds, "seconds": best, "relative": best / calibration, "checksum": checksum}
+    return report
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Compares a report with the baseline, by relative time when both have it and run on the same Python version
+    (the cost of the calibration loop and of the benchmarks move differently between versions), in seconds otherwise
+
+    param arg1: the report from run()
+    param arg2: a report stored earlier
+    param arg3: how much slower than the baseline a benchmark may be, 0.3 is 30% slower
+
+    Returns: one message per problem, a benchmark that got slower than allowed or that did different work (checksum)
+
+    Complexity: O(n), n is the number of benchmarks
+    """
+    problems = []
+    unit = "relative" if report.get("python") == baseline.get("python") and "calibration" in baseline else "seconds"
+    for name, result in report["benchmarks"].items():
+        expected = baseline["benchmarks"].get(name)
+        if expected is None:
+            continue
+        if expected["checksum"] != result["checksum"] or expected["rounds"] != result["rounds"]:
+            problems.append(f"{name}: checksum {result['checksum']} over {result['rounds']} rounds, "
+                            f"baseline has {expected['checksum']} over {expected['rounds']}, the benchmark no longer does the same work")
+        elif result[unit] > expected[unit] * (1 + tolerance):
+            problems.append(f"{name}: {result['seconds']:.4f}s ({result['relative']:.2f} calibrations), "
+                            f"baseline {expected['seconds']:.4f}s ({expected.get('relative', float('nan')):.2f} calibrations), "
+                            f"{unit} {result[unit] / expected[unit] - 1:+.0%}, tolerance {tolerance:.0%}")
+    return problems
+
+
+def main(argv=None) -> int:
+    """
+    Command line entry point
+
+    Returns: the exit status, 1 when a regression was found
+    """
+    p = argparse.ArgumentParser(prog="python -m benchmarks")
+    p.add_argument("--only", default="", help="Only run the benchmarks whose name starts with this.")
+    p.add_argument("--repeat", type=int, default=5, help="Runs of every benchmark, the fastest is kept.")
+    p.add_argument("--output", help="Also write the JSON report to this file.")
+    p.add_argument("--baseline", default=BASELINE_PATH, help="Baseline to compare against.")
+    p.add_argument("--tolerance", type=float, default=0.3, help="Allowed slowdown against the baseline (0.3 = 30%%).")
+    p.add_argument("--save-baseline", action="store_true", help="Store the report as the baseline instead of comparing.")
+    args = p.parse_args(argv)
+
+    report = run(args.only, args.repeat)
+    text = json.dumps(report, indent=2, sort_keys=True)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text + "\n")
+    if args.save_baseline:
+        with open(args.baseline, "w") as file:
+            file.write(text + "\n")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}, run with --save-baseline first", file=sys.stderr)
+        return 0
+    with open(args.baseline) as file:
+        problems = compare(report, json.load(file), args.tolerance)
+    for problem in problems:
+        print("REGRESSION " + problem, file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,268 @@
+"""
+This module contains the checkpoints of a BattleTower: save() and load() a whole tower, and AutoCheckpoint to save it while it is played
+"""
+
+__author__ = "Teh Yee Hong"
+
+import json
+import os
+import random
+import struct
+import time
+import zlib
+from array import array
+from pokemon_base import PokeType
+from pokemon import get_all_pokemon_types
+from poke_team import Trainer
+from tower import BattleTower, EnemyQueue
+from rng import StreamRandom
+from battle_cache import members, rebuild
+from data_structures.referential_array import ArrayR
+from data_structures.stack_adt import ArrayStack
+from data_structures.sorted_stack import SortedStack
+from data_structures.queue_adt import CircularQueue
+from data_structures.sorted_list_adt import ListItem
+
+MAGIC = b"PKCP"
+VERSION = 2
+HEADER = struct.Struct("<4sH")
+# everything a Pokemon can change, its class gives the rest (evolution_line)
+FIELDS = ("name", "health", "max_hp", "level", "experience", "battle_power", "defence", "speed", "poketype", "evolution_stage")
+
+
+def _encode_pokemon(pokemon) -> list:
+    return [pokemon.get_species().__name__] + [getattr(pokemon, name).value if name == "poketype" else getattr(pokemon, name) for name in FIELDS]
+
+
+def _decode_pokemon(state: list, species: dict):
+    pokemon = species[state[0]]()
+    for name, value in zip(FIELDS, state[1:]):
+        setattr(pokemon, name, PokeType(value) if name == "poketype" else value)
+    return pokemon
+
+
+def _encode_trainer(trainer: Trainer, rngs: dict) -> dict:
+    team = trainer.get_team()
+    pokemon = [team.team[i] for i in range(len(team.team))] if team.team is not None else []
+    positions = {id(x): i for i, x in enumerate(pokemon) if x is not None}
+    battle_team = None
+    if team.battle_team is team.team:
+        battle_team = ["team"]
+    elif team.battle_team is not None:
+        kind = "sorted_stack" if isinstance(team.battle_team, SortedStack) else \
+            "stack" if isinstance(team.battle_team, ArrayStack) else "queue"
+        battle_team = [kind, len(team.battle_team.array), [positions[id(x)] for x in members(team.battle_team)]]
+    return {"name": trainer.get_name(),
+            "team": None if team.team is None else [None if x is None else _encode_pokemon(x) for x in pokemon],
+            "team_count": team.team_count, "criterion": team.criterion, "battle_team": battle_team, "rng": _rng_index(team.rng, rngs),
+            "poketypedex": [trainer.poketypedex[i].value for i in range(trainer.registered_count)]}
+
+
+def _decode_trainer(state: dict, species: dict, rngs: list) -> Trainer:
+    trainer = Trainer(state["name"], rngs[state["rng"]])
+    team = trainer.get_team()
+    team.team_count = state["team_count"]
+    team.criterion = state["criterion"]
+    if state["team"] is not None:
+        team.team = ArrayR(len(state["team"]))
+        for i, pokemon in enumerate(state["team"]):
+            team.team[i] = None if pokemon is None else _decode_pokemon(pokemon, species)
+    battle_team = state["battle_team"]
+    if battle_team is not None and battle_team[0] == "team":
+        team.battle_team = team.team
+    elif battle_team is not None:
+        kind, capacity, positions = battle_team
+        team.battle_team = SortedStack(capacity, team.criterion_key()) if kind == "sorted_stack" else \
+            ArrayStack(capacity) if kind == "stack" else CircularQueue(capacity)
+        rebuild(team.battle_team, [team.team[i] for i in positions])
+    for value in state["poketypedex"]:
+        poketype = PokeType(value)
+        trainer.registered_types.add(value + 1)
+        trainer.poketypedex[trainer.registered_count] = poketype
+        trainer.registered_count += 1
+    return trainer
+
+
+def _encode_rng(rng) -> list:
+    if rng is random:
+        return ["module", random.getstate()]
+    if isinstance(rng, StreamRandom):
+        return ["stream", rng.getstate()]
+    return ["random", rng.getstate()]
+
+
+def _rng_index(rng, rngs: dict) -> int:
+    # every generator is saved once, trainers and the tower sharing one keep sharing it once restored
+    if id(rng) not in rngs:
+        rngs[id(rng)] = (len(rngs), _encode_rng(rng))
+    return rngs[id(rng)][0]
+
+
+def _decode_rng(state: list):
+    kind, values = state
+    if kind == "stream":
+        rng = StreamRandom()
+        rng.setstate(tuple(values))
+        return rng
+    values = (values[0], tuple(values[1]), values[2])
+    if kind == "module":
+        random.setstate(values)
+        return random
+    rng = random.Random()
+    rng.setstate(values)
+    return rng
+
+
+def encode(tower: BattleTower) -> bytes:
+    """
+    Encodes the whole state of a tower between two battles: the challenger and its lives, the enemies in queue order
+    with every Pokemon's stats, level and evolution stage, every poketypedex, enemies_defeated_count and the random
+    generators of the tower and of every trainer
+
+    param arg1: the tower
+
+    Returns: HEADER followed by the zlib compressed JSON of the state
+
+    Complexity: O(n), n is the number of enemies
+    """
+    enemies = tower.enemies
+    rngs = {}
+    state = {"rng": _rng_index(tower.rng, rngs), "enemies_defeated_count": tower.enemies_defeated_count,
+             "challenger": None if tower.the_trainer is None else [_encode_trainer(tower.the_trainer.value, rngs), tower.the_trainer.key],
+             "enemies": None}
+    if enemies is not None:
+        state["enemies"] = {"species": enemies.species.tolist(), "lives": enemies.lives.tolist(), "fresh": enemies.fresh,
+                            "length": len(enemies),
+                            "returned": [[_encode_trainer(item.value, rngs), item.key] for item in members(enemies.returned)]}
+    state["rngs"] = [encoded for _, encoded in sorted(rngs.values(), key=lambda entry: entry[0])]
+    return HEADER.pack(MAGIC, VERSION) + zlib.compress(json.dumps(state, separators=(",", ":")).encode(), 6)
+
+
+def decode(data: bytes, cache=None) -> BattleTower:
+    """
+    Rebuilds a tower from encode(), playing it on gives the same results as the tower that was encoded.
+    A tower playing from the random module restores the state of the random module.
+
+    param arg1: the bytes from encode()
+    param arg2: the battle_cache.BattleCache of the new tower, caches are not saved
+
+    Returns: the BattleTower
+
+    Raises:
+        ValueError: when the bytes are not a checkpoint of this version
+
+    Complexity: O(n), n is the number of enemies
+    """
+    if len(data) < HEADER.size or HEADER.unpack_from(data, 0) != (MAGIC, VERSION):
+        raise ValueError("not a tower checkpoint of version " + str(VERSION))
+    state = json.loads(zlib.decompress(data[HEADER.size:]))
+    species = {cls.__name__: cls for cls in get_all_pokemon_types()}
+    rngs = [_decode_rng(rng) for rng in state["rngs"]]
+    tower = BattleTower(rngs[state["rng"]], cache)
+    tower.enemies_defeated_count = state["enemies_defeated_count"]
+    if state["challenger"] is not None:
+        trainer, lives = state["challenger"]
+        tower.the_trainer = ListItem(_decode_trainer(trainer, species, rngs), lives)
+    enemies = state["enemies"]
+    if enemies is not None:
+        tower.enemies = EnemyQueue(array("H", enemies["species"]), array("L", enemies["lives"]), tower.rng)
+        tower.enemies.fresh = enemies["fresh"]
+        tower.enemies.length = enemies["length"]
+        for trainer, lives in enemies["returned"]:
+            tower.enemies.returned.append(ListItem(_decode_trainer(trainer, species, rngs), lives))
+    return tower
+
+
+def save(tower: BattleTower, path: str) -> None:
+    """
+    Writes encode() to a file, through a temporary file that replaces it, so a crash never leaves half a checkpoint
+
+    param arg1: the tower
+    param arg2: the path of the checkpoint
+
+    Complexity: O(n), n is the number of enemies
+    """
+    _write(encode(tower), path)
+
+
+def _write(data: bytes, path: str) -> None:
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+
+
+def load(path: str, cache=None) -> BattleTower:
+    """
+    Reads a tower written by save()
+
+    param arg1: the path of the checkpoint
+    param arg2: the battle_cache.BattleCache of the new tower
+
+    Returns: the BattleTower
+
+    Complexity: O(n), n is the number of enemies
+    """
+    with open(path, "rb") as file:
+        return decode(file.read(), cache)
+
+
+class AutoCheckpoint:
+    """
+    Saves a tower after a battle now and then, pass it to BattleTower.battles(checkpoint=...).
+
+    A checkpoint is written every `every` battles when it is given, and otherwise as soon as the time since the
+    last one is long enough for the last write to be at most max_overhead of it, so a tower of thousands of enemies
+    (slow to save) is saved less often than a small one, and saving never costs more than about max_overhead of the run.
+    Until a checkpoint has been written, the time to encode the tower (measured once, after the first battle) stands
+    for the time to save it.
+    """
+
+    def __init__(self, path: str, every: int = None, max_overhead: float = 0.05) -> None:
+        """
+        Initializing a new instance of AutoCheckpoint
+
+        param arg1: the path of the checkpoint
+        param arg2: save every that many battles, by the overhead when not given
+        param arg3: the share of the run that saving may take
+        """
+        self.path = path
+        self.every = every
+        self.max_overhead = max_overhead
+        self.battles = 0
+        self.saves = 0
+        self.last_save = time.perf_counter()
+        self.save_seconds = None
+
+    def after_battle(self, tower: BattleTower) -> bool:
+        """
+        Called after every battle, saves the tower if it is time to
+
+        Returns: True when the tower was saved
+
+        Complexity: O(1), or O(n) to save, n is the number of enemies
+        """
+        self.battles += 1
+        data, encode_seconds = None, 0.0
+        if self.every is not None:
+            due = self.battles % self.every == 0
+        else:
+            if self.save_seconds is None:
+                start = time.perf_counter()
+                data = encode(tower)
+                self.save_seconds = encode_seconds = time.perf_counter() - start
+            due = time.perf_counter() - self.last_save >= self.save_seconds / self.max_overhead
+        if not due:
+            return False
+        start = time.perf_counter()
+        _write(data if data is not None else encode(tower), self.path)
+        self.last_save = time.perf_counter()
+        self.save_seconds = self.last_save - start + encode_seconds
+        self.saves += 1
+        return True
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,135 @@
+"""
+This module contains DamageTable, a precomputed attacker x defender damage table for every Pokemon species
+"""
+
+__author__ = "Teh Yee Hong"
+
+from pokemon import *
+
+
+class DamageTable:
+    """
+    Stores the result of Pokemon.calculate_damage() for every pair of (species, evolution stage).
+
+    Every species from get_all_pokemon_types() owns a run of consecutive slots, one per evolution stage it can
+    still reach, the damage of slot a attacking slot b is kept at a * slot_count + b in a flat ArrayR.
+    The stats of each stage are produced by the real Pokemon._evolve(), so the table is bit-identical to the formula.
+    A Pokemon is located in the table by its class and evolution_stage, which _evolve() increments,
+    so a Pokemon that evolves mid battle moves to its next slot on its own.
+    """
+
+    def __init__(self, species=None) -> None:
+        """
+        Initializing a new instance of DamageTable, the table is computed straight away
+
+        param arg1: the Pokemon classes to precompute, all the species from get_all_pokemon_types() when not given
+        """
+        self.species = species if species is not None else get_all_pokemon_types()
+        self.first_slot = {}
+        self.slot_count = 0
+        self.table = None
+        self.effectiveness = None
+        self.build()
+
+    def build(self) -> None:
+        """
+        (Re)computes the whole table, needed again only when the type effectiveness matrix is reloaded
+
+        Complexity:
+            O(n^2) for both best and worst case, n is the total number of evolution stages over all species
+        """
+        stages = []
+        self.first_slot = {}
+        for cls in self.species:
+            pokemon = cls()
+            self.first_slot[cls] = (len(stages), self._stage_count(pokemon))
+            stages.append(self._snapshot(pokemon))
+            for _ in range(self._stage_count(pokemon) - 1):
+                pokemon._evolve()
+                stages.append(self._snapshot(pokemon))
+
+        if TypeEffectiveness._table is None:
+            TypeEffectiveness.load()
+        self.effectiveness = TypeEffectiveness._table
+        self.slot_count = len(stages)
+        self.table = ArrayR(self.slot_count * self.slot_count)
+        for a in range(self.slot_count):
+            for b in range(self.slot_count):
+                self.table[a * self.slot_count + b] = stages[a].calculate_damage(stages[b])
+
+    def lookup(self, attacker: Pokemon, defender: Pokemon):
+        """
+        Returns the damage the attacker inflicts on the defender
+
+        param arg1: the attacking Pokemon
+        param arg2: the defending Pokemon
+
+        Returns: the damage as Pokemon.calculate_damage() would return it, None when either Pokemon is not in the table
+
+        Complexity:
+            O(1) for best case, both Pokemon are in the table
+            O(n^2) for worst case, the type effectiveness matrix was reloaded and the table has to be built again
+        """
+        if self.effectiveness is not TypeEffectiveness._table:
+            self.build()
+        attacker_slot = self._slot(attacker)
+        defender_slot = self._slot(defender)
+        if attacker_slot is None or defender_slot is None:
+            return None
+        return self.table[attacker_slot * self.slot_count + defender_slot]
+
+    def enable(self) -> None:
+        """
+        Makes Pokemon.attack() use this table
+
+        Complexity: O(1)
+        """
+        AbstractPokemon.damage_engine = self
+
+    @staticmethod
+    def disable() -> None:
+        """
+        Makes Pokemon.attack() go back to evaluating the damage formula
+
+        Complexity: O(1)
+        """
+        AbstractPokemon.damage_engine = None
+
+    def _slot(self, pokemon: Pokemon):
+        """
+        Returns the slot of the Pokemon's species and evolution stage, None when it has none
+
+        Complexity: O(1)
+        """
+        slots = self.first_slot.get(pokemon.get_species())
+        if slots is None or not 0 <= pokemon.evolution_stage < slots[1]:
+            return None
+        return slots[0] + pokemon.evolution_stage
+
+    @staticmethod
+    def _stage_count(pokemon: Pokemon) -> int:
+        """
+        Returns how many evolution stages a freshly created Pokemon goes through, counting the one it starts at
+
+        Complexity: O(n), n is the length of the evolution line
+        """
+        if len(pokemon.evolution_line) == 0:
+            return 1
+        return len(pokemon.evolution_line) - pokemon.evolution_line.index(pokemon.name)
+
+    @staticmethod
+    def _snapshot(pokemon: Pokemon) -> Pokemon:
+        """
+        Returns a copy of the Pokemon holding the stats that take part in the damage formula
+
+        Complexity: O(1)
+        """
+        copy = pokemon.get_species()()
+        copy.battle_power = pokemon.battle_power
+        copy.defence = pokemon.defence
+        copy.poketype = pokemon.poketype
+        return copy
+
+
+if __name__ == '__main__':
+    pass
@@ -23,10 +23,41 @@ class ArraySortedList(SortedList[T]):
         size = max(self.MIN_CAPACITY, max_capacity)
         self.array = ArrayR(size)
 
+    @classmethod
+    def from_items(cls, items, max_capacity: int = 0) -> 'ArraySortedList':
+        """ Builds a list holding the given items, exactly as adding them one by one would.
+        :complexity: see extend()
+        """
+        items = list(items)
+        result = cls(max(len(items), max_capacity))
+        result.extend(items)
+        return result
+
     def reset(self):
         """ Reset the list. """
         SortedList.__init__(self)
 
+    def extend(self, items) -> None:
+        """ Adds all the given items, the result is the same as calling add() on each of them in order.
+        When no two keys (old and new) are equal, the final order is the sorted order, so everything
+        is sorted once and written in one pass. An equal key is placed by add() wherever its binary
+        search lands, which depends on the insertion order, so with equal keys the items are added
+        one by one to keep that order. Equal keys are found by comparing neighbours once sorted, so keys
+        only need to be ordered, not hashable.
+        :complexity: O(n log n) when all keys are distinct, O(n^2) otherwise, n is the final length
+        """
+        items = list(items)
+        total = len(self) + len(items)
+        self.array.ensure_capacity(total)
+        merged = self.array[:len(self)] + items
+        merged.sort(key=lambda item: item.key)
+        if all(merged[i - 1].key != merged[i].key for i in range(1, total)):
+            self.array[:total] = merged
+            self.length = total
+        else:
+            for item in items:
+                self.add(item)
+
     def __getitem__(self, index: int) -> T:
         """ Magic method. Return the element at a given position. """
         return self.array[index]
@@ -51,32 +82,24 @@ class ArraySortedList(SortedList[T]):
 
     def __contains__(self, item: ListItem):
         """ Checks if value is in the list. """
-        for i in range(len(self)):
-            if self.array[i] == item:
-                return True
-        return False
+        try:
+            self.array.index(item, 0, len(self))
+            return True
+        except ValueError:
+            return False
 
     def _shuffle_right(self, index: int) -> None:
         """ Shuffle items to the right up to a given position. """
-        for i in range(len(self), index, -1):
-            self.array[i] = self.array[i - 1]
+        self.array.shift(index, len(self), 1)
 
     def _shuffle_left(self, index: int) -> None:
         """ Shuffle items starting at a given position to the left. """
-        for i in range(index, len(self)):
-            self.array[i] = self.array[i + 1]
+        self.array.shift(index + 1, len(self) + 1, -1)
 
     def _resize(self) -> None:
         """ Resize the list. """
-        # doubling the size of our list
-        new_array = ArrayR(2 * len(self.array))
-
-        # copying the contents
-        for i in range(self.length):
-            new_array[i] = self.array[i]
-
-        # referring to the new array
-        self.array = new_array
+        # doubling the size of our list, the contents are copied in C
+        self.array.ensure_capacity(2 * len(self.array))
 
     def delete_at_index(self, index: int) -> ListItem:
         """ Delete item at a given position. """
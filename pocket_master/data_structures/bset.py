@@ -13,6 +13,7 @@ class BSet(Set[int]):
         Attributes:
         elems (int): bitwise representation of the set
     """
+    __slots__ = ('elems',)
 
     def __init__(self, dummy_capacity: int = 1) -> None:
         """ Initialization. """
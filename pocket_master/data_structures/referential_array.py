@@ -12,6 +12,11 @@ space to hold the references.
 Note that while I do check the precondition in __init__ (noone else
 would), I do not check that of getitem or setitem, since that is already
 checked by self.array[index].
+
+Bulk operations (slices, shift, fill, index, resize) are done by the ctypes
+array itself, in C, instead of a Python loop over the elements. ctypes keeps
+the reference counts right on every store, which is why shift() copies through
+a slice rather than moving the raw pointers.
 """
 __author__ = "Julian Garcia for the __init__ code, Maria Garcia de la Banda for the rest"
 __docformat__ = 'reStructuredText'
@@ -22,6 +27,8 @@ from typing import TypeVar, Generic
 T = TypeVar('T')
 
 class ArrayR(Generic[T]):
+    __slots__ = ('array',)
+
     def __init__(self, length: int) -> None:
         """ Creates an array of references to objects of the given length
         :complexity: O(length) for best/worst case to initialise to None
@@ -30,7 +37,7 @@ class ArrayR(Generic[T]):
         if length <= 0:
             raise ValueError("Array length should be larger than 0.")
         self.array = (length * py_object)() # initialises the space
-        self.array[:] =  [None for _ in range(length)]
+        self.array[:] = [None] * length
 
     def __len__(self) -> int:
         """ Returns the length of the array
@@ -39,25 +46,74 @@ class ArrayR(Generic[T]):
         return len(self.array)
 
     def __getitem__(self, index: int) -> T:
-        """ Returns the object in position index.
-        :complexity: O(1)
+        """ Returns the object in position index, or a list of the objects in a slice.
+        :complexity: O(1) for an index, O(k) for a slice of k objects
         :pre: index in between 0 and length - self.array[] checks it
         """
         return self.array[index]
 
     def __setitem__(self, index: int, value: T) -> None:
-        """ Sets the object in position index to value
-        :complexity: O(1)
+        """ Sets the object in position index to value, or the objects in a slice to the
+        objects of a sequence of the same length.
+        :complexity: O(1) for an index, O(k) for a slice of k objects
         :pre: index in between 0 and length - self.array[] checks it
         """
         self.array[index] = value
-    
-    def index(self, item: T) -> int:
-        for index, arr_item in enumerate(self.array):
-            if arr_item == item:
-                return index
-        else:
-            raise ValueError("Value does not exist")
+
+    def shift(self, start: int, stop: int, offset: int) -> None:
+        """ Moves the objects in positions start to stop - 1 by offset positions, to the right
+        when offset is positive, overlapping ranges are fine. The positions left behind keep
+        their old objects.
+        :complexity: O(stop - start)
+        :pre: the moved range stays within the array
+        """
+        if start < stop and offset != 0:
+            if start + offset < 0 or stop + offset > len(self.array):
+                raise IndexError("shift out of the array")
+            self.array[start + offset:stop + offset] = self.array[start:stop]
+
+    def fill(self, value: T, start: int = 0, stop: int = None) -> None:
+        """ Sets every position from start to stop - 1 (to the end by default) to value.
+        :complexity: O(stop - start)
+        """
+        stop = len(self.array) if stop is None else stop
+        if start < stop:
+            self.array[start:stop] = [value] * (stop - start)
+
+    def resize(self, length: int) -> None:
+        """ Changes the length of the array in place, keeping the objects that still fit
+        and filling new positions with None.
+        :complexity: O(length)
+        :pre: length > 0
+        """
+        if length <= 0:
+            raise ValueError("Array length should be larger than 0.")
+        kept = min(length, len(self.array))
+        array = (length * py_object)()
+        array[:] = self.array[:kept] + [None] * (length - kept)
+        self.array = array
+
+    def ensure_capacity(self, length: int) -> None:
+        """ Grows the array to at least length positions, doubling it so that growing one
+        position at a time is amortised O(1).
+        :complexity: O(1) when it is long enough, O(length) otherwise
+        """
+        if length > len(self.array):
+            self.resize(max(length, 2 * len(self.array)))
+
+    def index(self, item: T, start: int = 0, stop: int = None) -> int:
+        """ Returns the first position from start to stop - 1 (to the end by default)
+        holding an object equal to item.
+        :complexity: O(n) time and O(n) extra space, the positions start to stop - 1 are first copied into a
+            list (one C call) which is then searched in C, several times faster than reading the ctypes array
+            one element at a time
+        :raises ValueError: if no such object is found
+        """
+        stop = len(self.array) if stop is None else stop
+        try:
+            return start + self.array[start:stop].index(item)
+        except ValueError:
+            raise ValueError("Value does not exist") from None
     
     def __str__(self) -> str:
         ret_str = "["
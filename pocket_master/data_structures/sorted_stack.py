@@ -0,0 +1,142 @@
+""" Array-based stack kept in ascending key order from the top.
+
+The top of the stack always holds the item with the smallest key, as the
+PokeTeam battle_team in optimise mode does. When only the key of the top
+item changes, reorder() moves that item to its place with a binary search
+and a shift, without rebuilding anything. Whenever two keys are equal the
+whole stack is replayed through the same insertions ArraySortedList.add()
+would perform, so equal keys end up exactly where a full re-sort would put
+them.
+"""
+__author__ = "Teh Yee Hong"
+__docformat__ = 'reStructuredText'
+
+from typing import Callable
+from data_structures.stack_adt import ArrayStack
+from data_structures.referential_array import ArrayR, T
+
+
+class SortedStack(ArrayStack[T]):
+    """ ArrayStack ordered by key, smallest key on top.
+
+    Attributes:
+         length (int): number of elements in the stack (inherited)
+         array (ArrayR[T]): array storing the elements, the top is at length - 1 (inherited)
+         key (Callable): function giving the key of an element
+         keys (ArrayR): key of every element, as it was when the element was placed
+         ties (int): number of neighbouring elements with equal keys in keys
+         ordered (bool): True if keys is in ascending order from the top
+    """
+
+    def __init__(self, max_capacity: int, key: Callable) -> None:
+        """ Initialises an empty stack, all the buffers are allocated here and reused afterwards. """
+        ArrayStack.__init__(self, max_capacity)
+        self.key = key
+        self.keys = ArrayR(len(self.array))
+        self.ties = 0
+        self.ordered = True
+        self._buffer = ArrayR(len(self.array))
+        self._buffer_keys = ArrayR(len(self.array))
+
+    def push(self, item: T) -> None:
+        """ Pushes an element to the top of the stack, keeping track of whether the stack is still in order.
+        :pre: stack is not full
+        :raises Exception: if the stack is full
+        :complexity: O(1), plus the cost of the key function
+        """
+        key = self.key(item)
+        if not self.is_empty():
+            if key == self.keys[self.length - 1]:
+                self.ties += 1
+            elif key > self.keys[self.length - 1]:
+                self.ordered = False
+        ArrayStack.push(self, item)
+        self.keys[self.length - 1] = key
+
+    def pop(self) -> T:
+        """ Pops the element at the top of the stack.
+        :pre: stack is not empty
+        :raises Exception: if the stack is empty
+        :complexity: O(1)
+        """
+        if self.length >= 2 and self.keys[self.length - 1] == self.keys[self.length - 2]:
+            self.ties -= 1
+        return ArrayStack.pop(self)
+
+    def clear(self) -> None:
+        """ Clears all elements from the stack. """
+        ArrayStack.clear(self)
+        self.ties = 0
+        self.ordered = True
+
+    def reorder(self) -> None:
+        """ Puts the stack back in order after the key of the top element changed.
+        :complexity: O(log n) comparisons and at most n moves when all keys are distinct,
+                     O(n^2) when there are equal keys and the full re-sort has to be replayed
+        """
+        if self.length == 0:
+            return
+        top = self.length - 1
+        new_key = self.key(self.array[top])
+        rest_ties = self.ties
+        if top > 0 and self.keys[top] == self.keys[top - 1]:
+            rest_ties -= 1
+        if not self.ordered or rest_ties != 0:
+            self._replay(new_key)
+            return
+
+        # the rest (indices top - 1 down to 0) is in ascending order from the top and has distinct keys,
+        # count how many of them are smaller than the new key
+        low = 0
+        high = top - 1
+        while low <= high:
+            mid = (low + high) // 2
+            mid_key = self.keys[top - 1 - mid]
+            if mid_key < new_key:
+                low = mid + 1
+            elif mid_key > new_key:
+                high = mid - 1
+            else:
+                self._replay(new_key)
+                return
+
+        item = self.array[top]
+        self.array.shift(top - low, top, 1)
+        self.keys.shift(top - low, top, 1)
+        self.array[top - low] = item
+        self.keys[top - low] = new_key
+
+    def _replay(self, top_key) -> None:
+        """ Re-sorts the stack by popping every element and adding it to a sorted buffer exactly like
+        ArraySortedList.add() does, then pushing the buffer back from its largest key.
+        :complexity: O(n^2) for both best and worst case
+        """
+        count = self.length
+        for popped in range(count):
+            i = count - 1 - popped
+            item = self.array[i]
+            key = top_key if popped == 0 else self.key(item)
+            # same search as ArraySortedList._index_to_add(), an equal key stops the search where it is found
+            low = 0
+            high = popped - 1
+            while low <= high:
+                mid = (low + high) // 2
+                if self._buffer_keys[mid] < key:
+                    low = mid + 1
+                elif self._buffer_keys[mid] > key:
+                    high = mid - 1
+                else:
+                    low = mid
+                    break
+            self._buffer.shift(low, popped, 1)
+            self._buffer_keys.shift(low, popped, 1)
+            self._buffer[low] = item
+            self._buffer_keys[low] = key
+
+        self.ties = 0
+        for j in range(count):
+            self.array[count - 1 - j] = self._buffer[j]
+            self.keys[count - 1 - j] = self._buffer_keys[j]
+            if j > 0 and self._buffer_keys[j] == self._buffer_keys[j - 1]:
+                self.ties += 1
+        self.ordered = True
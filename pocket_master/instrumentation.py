@@ -0,0 +1,145 @@
+"""
+This module contains BattleProfiler, an opt-in recorder of call counts and timings for the battle hot paths
+"""
+
+__author__ = "Teh Yee Hong"
+
+import json
+import threading
+from contextlib import contextmanager
+from time import perf_counter_ns
+from pokemon_base import TypeEffectiveness
+from poke_team import Trainer, PokeTeam
+
+
+class BattleProfiler:
+    """
+    Counts and times the hot paths of a Battle while it is attached to one.
+
+    Battle.commence_battle() attaches the profiler given to Battle(..., profiler=...) for the length of the battle:
+    actual_battle, not_equal_speed and both_minus_one are wrapped on the battle instance only, while
+    Trainer.register_pokemon, PokeTeam.assign_team and TypeEffectiveness.get_effectiveness are wrapped on their
+    class and restored once the battle is over, so nothing is wrapped, and nothing costs anything, without a profiler.
+    Patching the classes is process wide, profiled battles should not run in other threads at the same time.
+    """
+
+    BATTLE_METHODS = ("actual_battle", "not_equal_speed", "both_minus_one")
+    CLASS_METHODS = ((Trainer, "register_pokemon"), (PokeTeam, "assign_team"), (TypeEffectiveness, "get_effectiveness"))
+
+    def __init__(self, trace: bool = True) -> None:
+        """
+        Initializing a new instance of BattleProfiler
+
+        param arg1: whether every call is also kept as a trace event, needed for write_chrome_trace()
+        """
+        self.trace = trace
+        self.calls = {}
+        self.nanoseconds = {}
+        self.events = []
+        self.battles = 0
+        self._origin = perf_counter_ns()
+
+    def reset(self) -> None:
+        """
+        Forgets everything recorded so far
+
+        Complexity: O(1) for both best and worst case
+        """
+        self.calls = {}
+        self.nanoseconds = {}
+        self.events = []
+        self.battles = 0
+        self._origin = perf_counter_ns()
+
+    def wrap(self, name: str, function):
+        """
+        Wraps a function so that every call to it is counted and timed under name
+
+        param arg1: the name the calls are recorded under
+        param arg2: the function to wrap
+
+        Returns: the wrapping function
+
+        Complexity: O(1) for both best and worst case
+        """
+        calls, nanoseconds, events, trace = self.calls, self.nanoseconds, self.events, self.trace
+        calls.setdefault(name, 0)
+        nanoseconds.setdefault(name, 0)
+
+        def wrapper(*args, **kwargs):
+            start = perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = perf_counter_ns() - start
+                calls[name] += 1
+                nanoseconds[name] += elapsed
+                if trace:
+                    events.append((name, start, elapsed, threading.get_ident()))
+        return wrapper
+
+    @contextmanager
+    def attach(self, battle):
+        """
+        Wraps the hot paths of a battle for the length of the with block, see the class docstring
+
+        param arg1: the Battle to profile
+
+        Complexity: O(1) for both best and worst case
+        """
+        patched = []
+        try:
+            for name in self.BATTLE_METHODS:
+                setattr(battle, name, self.wrap(name, getattr(battle, name)))
+            for cls, name in self.CLASS_METHODS:
+                original = cls.__dict__[name]
+                if isinstance(original, classmethod):
+                    setattr(cls, name, classmethod(self.wrap(name, original.__func__)))
+                else:
+                    setattr(cls, name, self.wrap(name, original))
+                patched.append((cls, name, original))
+            self.battles += 1
+            yield self
+        finally:
+            for cls, name, original in reversed(patched):
+                setattr(cls, name, original)
+            for name in self.BATTLE_METHODS:
+                battle.__dict__.pop(name, None)
+
+    def summary(self) -> dict:
+        """
+        Returns: {"battles": n, "calls": {name: {"calls", "total_ms", "mean_us"}}}, exchanges are the actual_battle calls
+
+        Complexity: O(n) for both best and worst case, n is the number of names recorded
+        """
+        calls = {}
+        for name, count in self.calls.items():
+            total = self.nanoseconds[name]
+            calls[name] = {"calls": count, "total_ms": total / 1e6, "mean_us": total / count / 1e3 if count else 0.0}
+        return {"battles": self.battles, "exchanges": self.calls.get("actual_battle", 0), "calls": calls}
+
+    def chrome_trace(self) -> dict:
+        """
+        Returns: the recorded calls in the Chrome trace event format, open it in chrome://tracing or Perfetto
+
+        Complexity: O(n) for both best and worst case, n is the number of recorded calls
+        """
+        events = [{"name": name, "cat": "battle", "ph": "X", "pid": 0, "tid": tid,
+                   "ts": (start - self._origin) / 1e3, "dur": elapsed / 1e3}
+                  for name, start, elapsed, tid in self.events]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path: str) -> None:
+        """
+        Writes chrome_trace() as a JSON file
+
+        param arg1: the path of the file
+
+        Complexity: O(n) for both best and worst case, n is the number of recorded calls
+        """
+        with open(path, "w") as file:
+            json.dump(self.chrome_trace(), file)
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,312 @@
+"""
+This module contains MatchupMatrix, the precomputed outcome of every SET duel between two fresh Pokemon species stages
+"""
+
+__author__ = "Teh Yee Hong"
+
+import os
+import struct
+import sys
+import zlib
+from array import array
+from pokemon_base import TypeEffectiveness
+from poke_team import Trainer
+from battle import Battle
+from battle_mode import BattleMode
+from damage_table import DamageTable
+
+
+def _no_level_up(self) -> None:
+    pass
+
+
+class MatchupMatrix:
+    """
+    Who wins a SET duel (the same two front Pokemon fighting until one faints) between species stage a and species
+    stage b, after how many exchanges and with what health left, for every pair of registered counts in pairs.
+
+    Stages are numbered like DamageTable slots. A Pokemon matches its slot when it is fresh: its health, battle_power,
+    defence and speed are those of a newly created Pokemon of the species evolved evolution_stage times, down to
+    whether they are int or float. A duel only depends on those, the two Pokemon's types and both trainers' registered
+    counts (the pokedex completions), level and experience play no part until the survivor levels up at the end,
+    which is left to the real level_up().
+
+    The full table over every pair of counts is slots^2 * 15^2 duels (about 4.9 million, 99 MB), so by default only
+    equal counts are kept: c / c is exactly 1.0 whatever c is, so a single plane of slots^2 duels covers every duel
+    between trainers with the same completion, the most frequent pair. size() gives the cost of other pairs first.
+    The outcomes are kept in stdlib arrays (winner 'b', rounds 'H', both healths 'd') and saved as a versioned file,
+    rounds being the number of actual_battle() exchanges the duel took, see outcome(). float_flags
+    records (bit 1 for the first Pokemon, bit 2 for the second) which healths were Python floats, so that a health
+    the duel leaves as an int is given back as an int.
+    """
+    SOURCE_PATHS = (os.path.join(os.path.dirname(os.path.abspath(__file__)), "species.csv"), TypeEffectiveness.FILE_PATH)
+    COMPILED_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "matchups.bin")
+    MAGIC = b"PKMM"
+    VERSION = 3
+    HEADER = struct.Struct("<4sHHHI")
+    EQUAL = ((1, 1),)
+    MAX_CELLS = 2_000_000
+    CELL_BYTES = 1 + 1 + 2 + 8 + 8
+    STATS = ("health", "battle_power", "defence", "speed")
+
+    def __init__(self, pairs=EQUAL) -> None:
+        """
+        Initializing an empty MatchupMatrix, see build() and open()
+
+        param arg1: the (registered count of trainer 1, registered count of trainer 2) pairs to cover,
+                    (1, 1) stands for every pair of equal counts
+        """
+        self.pairs = tuple(tuple(pair) for pair in pairs)
+        self.table = DamageTable()
+        self.slot_count = self.table.slot_count
+        self.stats = []
+        self.winner = self.float_flags = self.rounds = self.health1 = self.health2 = None
+        self.effectiveness = None
+
+    @classmethod
+    def size(cls, pairs=EQUAL) -> tuple:
+        """
+        Returns: (number of duels, bytes) of a matrix over the pairs
+
+        Complexity: O(n), n is the number of species
+        """
+        slots = DamageTable().slot_count
+        cells = slots * slots * len(pairs)
+        return cells, cells * cls.CELL_BYTES
+
+    def build(self) -> None:
+        """
+        Plays every duel
+
+        Raises:
+            ValueError: when the matrix would have more than MAX_CELLS duels
+
+        Complexity: O(s^2 * p) duels, s is the number of slots and p of pairs
+        """
+        cells, size = self.size(self.pairs)
+        if cells > self.MAX_CELLS:
+            raise ValueError(f"{cells} duels ({size} bytes) is more than MAX_CELLS, cover fewer pairs")
+        fresh = self._fresh_stages()
+        probes = {cls: type(cls.__name__, (cls,), {"__slots__": (), "level_up": _no_level_up})
+                  for cls in self.table.species}
+        probe_stages = [(probes[cls], stage) for cls, stage in fresh]
+
+        self.winner = array("b", bytes(cells))
+        self.float_flags = array("B", bytes(cells))
+        self.rounds = array("H", bytes(2 * cells))
+        self.health1 = array("d", bytes(8 * cells))
+        self.health2 = array("d", bytes(8 * cells))
+        trainer_1, trainer_2 = Trainer("1"), Trainer("2")
+        battle = Battle(trainer_1, trainer_2, BattleMode.SET)
+        cell = 0
+        for count_1, count_2 in self.pairs:
+            trainer_1.registered_count, trainer_2.registered_count = count_1, count_2
+            for a in range(self.slot_count):
+                for b in range(self.slot_count):
+                    p1, p2 = self._fresh(*probe_stages[a]), self._fresh(*probe_stages[b])
+                    rounds = 0
+                    while p1.is_alive() and p2.is_alive():
+                        battle.actual_battle(p1, p2)
+                        rounds += 1
+                    self.rounds[cell] = rounds
+                    self.winner[cell] = 1 if p1.is_alive() else 2 if p2.is_alive() else 0
+                    self.float_flags[cell] = isinstance(p1.health, float) | isinstance(p2.health, float) << 1
+                    self.health1[cell] = p1.health
+                    self.health2[cell] = p2.health
+                    cell += 1
+
+    def _fresh_stages(self) -> list:
+        """
+        Returns the (species, evolution stage) of every slot and sets stats to their fresh stats
+
+        Complexity: O(s), s is the number of slots
+        """
+        if TypeEffectiveness._table is None:
+            TypeEffectiveness.load()
+        self.effectiveness = TypeEffectiveness._table
+        fresh = [None] * self.slot_count
+        for cls, (first, count) in self.table.first_slot.items():
+            for stage in range(count):
+                fresh[first + stage] = (cls, stage)
+        self.stats = [self._stats(self._fresh(*slot)) for slot in fresh]
+        return fresh
+
+    @staticmethod
+    def _fresh(cls, stage):
+        pokemon = cls()
+        for _ in range(stage):
+            pokemon._evolve()
+        return pokemon
+
+    @classmethod
+    def _stats(cls, pokemon) -> tuple:
+        values = [getattr(pokemon, stat) for stat in cls.STATS]
+        return tuple(values) + tuple(type(value) for value in values)
+
+    def _pair(self, battle):
+        count_1, count_2 = battle.trainer_1.registered_count, battle.trainer_2.registered_count
+        if self.pairs == self.EQUAL:
+            return 0 if count_1 == count_2 else None
+        try:
+            return self.pairs.index((count_1, count_2))
+        except ValueError:
+            return None
+
+    def outcome(self, a: int, b: int, pair: int = 0) -> tuple:
+        """
+        The stored result of one duel
+
+        param arg1: the slot of the first Pokemon
+        param arg2: the slot of the second Pokemon
+        param arg3: the index of the registered counts in pairs
+
+        Returns: (winner 1, 2 or 0 for a draw, rounds, health of the first Pokemon, health of the second Pokemon)
+
+        Complexity: O(1) for both best and worst case
+        """
+        cell = (pair * self.slot_count + a) * self.slot_count + b
+        flags = self.float_flags[cell]
+        return (self.winner[cell], self.rounds[cell], self.health1[cell] if flags & 1 else int(self.health1[cell]),
+                self.health2[cell] if flags & 2 else int(self.health2[cell]))
+
+    def duel(self, battle, p1, p2):
+        """
+        Plays a whole SET duel at once when both Pokemon are fresh and the registered counts are covered
+
+        param arg1: the Battle, its trainers have registered both Pokemon
+        param arg2: Pokemon by first trainer
+        param arg3: Pokemon by second trainer
+
+        Returns: both Pokemon's life after the duel as actual_battle() returns them, None when the matrix does not cover it
+
+        Complexity: O(1) for both best and worst case
+        """
+        if self.effectiveness is not TypeEffectiveness._table:
+            return None
+        pair = self._pair(battle)
+        a, b = self.table._slot(p1), self.table._slot(p2)
+        if pair is None or a is None or b is None or self._stats(p1) != self.stats[a] or self._stats(p2) != self.stats[b]:
+            return None
+        winner, _, p1.health, p2.health = self.outcome(a, b, pair)
+        if winner == 1:
+            p1.level_up()
+        elif winner == 2:
+            p2.level_up()
+        return p1.is_alive(), p2.is_alive()
+
+    def enable(self) -> None:
+        """
+        Makes Battle.set_battle() look duels up in this matrix
+
+        Complexity: O(1)
+        """
+        Battle.matchups = self
+
+    @staticmethod
+    def disable() -> None:
+        """
+        Makes Battle.set_battle() go back to playing every duel exchange by exchange
+
+        Complexity: O(1)
+        """
+        Battle.matchups = None
+
+    @classmethod
+    def source_crc(cls) -> int:
+        """
+        Returns: the crc32 of species.csv and type_effectiveness.csv, a saved matrix built from other files is stale
+
+        Complexity: O(n), n is the size of the files
+        """
+        crc = 0
+        for path in cls.SOURCE_PATHS:
+            with open(path, "rb") as file:
+                crc = zlib.crc32(file.read(), crc)
+        return crc
+
+    def to_bytes(self) -> bytes:
+        """
+        Returns: the matrix as HEADER, the pairs (two unsigned bytes each) and the five arrays, little endian
+
+        Complexity: O(n), n is the number of duels
+        """
+        arrays = [self.winner, self.float_flags, self.rounds, self.health1, self.health2]
+        if sys.byteorder == "big":
+            arrays = [array(x.typecode, x) for x in arrays]
+            for x in arrays:
+                x.byteswap()
+        return self.HEADER.pack(self.MAGIC, self.VERSION, self.slot_count, len(self.pairs), self.source_crc()) + \
+            bytes([count for pair in self.pairs for count in pair]) + b"".join(x.tobytes() for x in arrays)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "MatchupMatrix":
+        """
+        Reads a matrix written by to_bytes()
+
+        Raises:
+            ValueError: when the bytes are not a matrix of this version, or are stale
+
+        Complexity: O(n), n is the number of duels
+        """
+        if len(data) < cls.HEADER.size:
+            raise ValueError("not a matchup matrix")
+        magic, version, slot_count, pair_count, crc = cls.HEADER.unpack_from(data, 0)
+        if magic != cls.MAGIC or version != cls.VERSION:
+            raise ValueError("not a matchup matrix of version " + str(cls.VERSION))
+        if crc != cls.source_crc():
+            raise ValueError("stale matchup matrix")
+        offset = cls.HEADER.size
+        pairs = [(data[offset + 2 * i], data[offset + 2 * i + 1]) for i in range(pair_count)]
+        matrix = cls(pairs)
+        cells = slot_count * slot_count * pair_count
+        if slot_count != matrix.slot_count or len(data) != offset + 2 * pair_count + cells * cls.CELL_BYTES:
+            raise ValueError("matchup matrix does not match the species")
+        offset += 2 * pair_count
+        arrays = []
+        for typecode in "bBHdd":
+            x = array(typecode)
+            x.frombytes(data[offset:offset + cells * x.itemsize])
+            if sys.byteorder == "big":
+                x.byteswap()
+            arrays.append(x)
+            offset += cells * x.itemsize
+        matrix.winner, matrix.float_flags, matrix.rounds, matrix.health1, matrix.health2 = arrays
+        matrix._fresh_stages()
+        return matrix
+
+    @classmethod
+    def open(cls, path: str = None) -> "MatchupMatrix":
+        """
+        Returns the matrix of equal counts, read from path when it is up to date, built in memory otherwise,
+        nothing is written, see save()
+
+        param arg1: the file, matchups.bin next to this module when not given
+
+        Complexity: O(n) to read it, O(s^2) duels to build it, s is the number of slots
+        """
+        path = cls.COMPILED_PATH if path is None else path
+        try:
+            with open(path, "rb") as file:
+                return cls.from_bytes(file.read())
+        except (OSError, ValueError):
+            pass
+        matrix = cls()
+        matrix.build()
+        return matrix
+
+    def save(self, path: str = None) -> None:
+        """
+        Writes the matrix to path, through a temporary file so that a reader never sees half a matrix
+
+        param arg1: the file, matchups.bin next to this module when not given
+
+        Complexity: O(n), n is the number of duels
+        """
+        path = self.COMPILED_PATH if path is None else path
+        with open(path + ".tmp", "wb") as file:
+            file.write(self.to_bytes())
+        os.replace(path + ".tmp", path)
+
+
+if __name__ == '__main__':
+    MatchupMatrix.open().save()
@@ -6,34 +6,53 @@ __author__ = "Teh Yee Hong"
 
 from pokemon import *
 import random
+from operator import methodcaller
 from typing import List
 from battle_mode import BattleMode
 from data_structures.array_sorted_list import ArraySortedList
 from data_structures.stack_adt import ArrayStack
+from data_structures.sorted_stack import SortedStack
 from data_structures.queue_adt import CircularQueue
 from data_structures.sorted_list_adt import ListItem
 from data_structures.referential_array import ArrayR
+from data_structures.bset import BSet
+
+class _AllSpecies:
+    """
+    PokeTeam.POKE_LIST, get_all_pokemon_types() looked up when it is first used rather than when this module is imported
+    """
+
+    def __get__(self, instance, owner) -> tuple:
+        return get_all_pokemon_types()
+
 
 class PokeTeam:
     """
     Represents a team of Pokemon
+
+    rng is where choose_randomly() draws from, the random module itself unless another generator
+    (e.g. a rng.StreamRandom) is given, so random.seed() keeps producing the same teams
     """
+    __slots__ = ("team", "team_count", "battle_team", "criterion", "rng")
     TEAM_LIMIT = 6
-    POKE_LIST = get_all_pokemon_types()
+    POKE_LIST = _AllSpecies()
     CRITERION_LIST = ["health", "defence", "battle_power", "speed", "level"]
     random.seed(20)
 
-    def __init__(self):
+    def __init__(self, rng=None):
         """
         initialize a new instance of PokeTeam class
         team and battle_team is different in my code,
         team is just used to store all the pokemon own by a trainer,
         battle_team is the team used for battling
+
+        param arg1: the random generator of the team, the random module when not given
         """
         self.team = None
         self.team_count = 0
         self.battle_team = None
         self.criterion = None
+        self.rng = rng if rng is not None else random
 
     def choose_manually(self):
         """
@@ -61,15 +80,39 @@ class PokeTeam:
         """
         Use to choose Pokemon randomly, will choose until it reaches TEAM_LIMIT
 
+        Complexity:
+            O(n) for both best and worst case
+        """
+        self.choose_by_index(self.draw_indices(self.rng))
+
+    @classmethod
+    def draw_indices(cls, rng) -> List[int]:
+        """
+        Draws the positions in get_all_pokemon_types() of a random team, exactly as choose_randomly() does
+
+        param arg1: the random generator to draw from
+
+        Returns: TEAM_LIMIT positions
+
+        Complexity: O(n) for both best and worst case
+        """
+        last = len(get_all_pokemon_types()) - 1
+        return [rng.randint(0, last) for _ in range(cls.TEAM_LIMIT)]
+
+    def choose_by_index(self, indices) -> None:
+        """
+        Makes the team out of the species at the given positions of get_all_pokemon_types()
+
+        param arg1: the positions, TEAM_LIMIT of them at most
+
         Complexity:
             O(n) for both best and worst case
         """
         self.team = ArrayR(self.TEAM_LIMIT)
         all_pokemon = get_all_pokemon_types()
         self.team_count = 0
-        for i in range(self.TEAM_LIMIT):
-            rand_int = random.randint(0, len(all_pokemon)-1)
-            choice = all_pokemon[rand_int]()
+        for i, index in enumerate(indices):
+            choice = all_pokemon[index]()
             choice.set_max_hp()
             self.team[i] = choice
             self.team_count += 1
@@ -93,35 +136,14 @@ class PokeTeam:
     def assign_team(self) -> None:
         """
         Will reassign the battle_team based on the criterion of the battle (only available in optimised mode)
+        In a battle only the Pokemon on top of the battle_team has fought since the last call, so only that one is moved,
+        see SortedStack.reorder()
 
         Complexity:
-            Best case is O(n), when all the Pokemon are already sorted based on the criterion, so no sorting is needed, it will be faster
-            Worst case is O(n * log n) = O(n), when all the Pokemon are reverse sorted, max arrangement is needed, sorting will be slower
+            Best case is O(log n), when the keys are all different, the Pokemon on top is moved to its place with a binary search
+            Worst case is O(n^2) = O(n), when some keys are equal and the sorting has to be replayed to keep equal keys in the same order as before
         """
-        temp = ArraySortedList(6)
-        count = 0
-        team_count = len(self.battle_team)
-        while count != team_count:  
-            x = self.battle_team.pop()
-            if x is not None:
-                if self.criterion == "health":
-                    p = ListItem(x, x.get_health())
-                    temp.add(p)
-                elif self.criterion == "defence":
-                    p = ListItem(x, x.get_defence())
-                    temp.add(p)
-                elif self.criterion == "battle_power":
-                    p = ListItem(x, x.get_battle_power())
-                    temp.add(p)
-                elif self.criterion == "speed":
-                    p = ListItem(x, x.get_speed())
-                    temp.add(p)
-                elif self.criterion == "level":
-                    p = ListItem(x, x.get_level())
-                    temp.add(p)
-            count += 1
-        for i in range(len(temp) - 1, -1, -1):  # reversed
-            self.battle_team.push(temp[i].value)
+        self.battle_team.reorder()
 
     def assemble_team(self, battle_mode: BattleMode, criterion=None) -> None:
         """
@@ -154,29 +176,41 @@ class PokeTeam:
                 count += 1
 
         elif mode == 2:
-            temp = ArraySortedList(6)  # an ArraySortedList will be used to sort all the Pokemon first, then only push to an ArrayStack
-            count = 0
-            while count != 6:
-                if self.criterion == "health":
-                    p = ListItem(self.team[count], self.team[count].get_health())
-                    temp.add(p)
-                elif self.criterion == "defence":
-                    p = ListItem(self.team[count], self.team[count].get_defence())
-                    temp.add(p)
-                elif self.criterion == "battle_power":
-                    p = ListItem(self.team[count], self.team[count].get_battle_power())
-                    temp.add(p)
-                elif self.criterion == "speed":
-                    p = ListItem(self.team[count], self.team[count].get_speed())
-                    temp.add(p)
-                elif self.criterion == "level":
-                    p = ListItem(self.team[count], self.team[count].get_level())
-                    temp.add(p)
-                count += 1
-            self.battle_team = ArrayStack(6)
+            # an ArraySortedList will be used to sort all the Pokemon first, then only push to an ArrayStack
+            temp = self._sorted_by_criterion(self.team[count] for count in range(6))
+            self.battle_team = SortedStack(6, self.criterion_key())
             for i in range(len(temp) - 1, -1, -1):
                 self.battle_team.push(temp[i].value)
 
+    def _sorted_by_criterion(self, pokemon) -> ArraySortedList:
+        """
+        Sorts Pokemon by the criterion, in the same order as adding them one by one to an ArraySortedList
+
+        param arg1: the Pokemon, in the order they would be added
+
+        Returns: an ArraySortedList of ListItem(pokemon, value of the criterion), empty when the criterion is not in CRITERION_LIST
+
+        Complexity:
+            Best case is O(n log n), when the values are all different, see ArraySortedList.extend()
+            Worst case is O(n^2), when some values are equal
+        """
+        key = self.criterion_key()
+        if key is None:
+            return ArraySortedList(6)
+        return ArraySortedList.from_items([ListItem(x, key(x)) for x in pokemon], 6)
+
+    def criterion_key(self):
+        """
+        Gives the function returning the value of the criterion of a Pokemon, through its getter (get_health, get_speed, ...)
+
+        Returns: a function taking a Pokemon, None when the criterion is not in CRITERION_LIST
+
+        Complexity: O(n), n is the length of CRITERION_LIST
+        """
+        if self.criterion not in self.CRITERION_LIST:
+            return None
+        return methodcaller("get_" + self.criterion)
+
     def special(self, battle_mode: BattleMode) -> None:
         """
         will change the battle_team formation based on the battle_mode
@@ -234,28 +268,15 @@ class PokeTeam:
         Complexity: Best and worst are both O(n), this will only be called after the team is in sorted order,
                     so just reversing when adding into the battle_team
         """
-        temp = ArraySortedList(6)
+        popped = []
         count = 0
         team_count = len(self.battle_team)
         while count != team_count:
             x = self.battle_team.pop()
             if x is not None:
-                if self.criterion == "health":
-                    p = ListItem(x, x.get_health())
-                    temp.add(p)
-                elif self.criterion == "defence":
-                    p = ListItem(x, x.get_defence())
-                    temp.add(p)
-                elif self.criterion == "battle_power":
-                    p = ListItem(x, x.get_battle_power())
-                    temp.add(p)
-                elif self.criterion == "speed":
-                    p = ListItem(x, x.get_speed())
-                    temp.add(p)
-                elif self.criterion == "level":
-                    p = ListItem(x, x.get_level())
-                    temp.add(p)
+                popped.append(x)
             count += 1
+        temp = self._sorted_by_criterion(popped)
         for i in range(len(temp)):
             self.battle_team.push(temp[i].value)
 
@@ -271,29 +292,58 @@ class PokeTeam:
             Best case is O(1), when battle_team is already an ArrayR
             Worst case is O(n), when battle_team is not an ArrayR, and all the Pokemon are alive
         """
+        if not isinstance(self.battle_team, (ArrayStack, CircularQueue)):
+            return self.battle_team
         temp = ArrayR(6)
         count = 0
-        if isinstance(self.battle_team, ArrayStack):
-            temp_stack = ArrayStack(len(self.battle_team))
-            for i in range(len(self.battle_team)):
-                x = self.battle_team.pop()
-                temp_stack.push(x)
+        for x in self._alive():
+            temp[count] = x
+            count += 1
+        return temp
+
+    def _alive(self):
+        """
+        Iterates over the battle_team in battle order (top of the stack or front of the queue first) without copying it
+        and without touching the state of the stack or queue, only the Pokemon still alive are given
+        When battle_team is still the ArrayR of the chosen team, every Pokemon in it is given
+
+        Complexity: O(n) for best and worst case to go through the whole team, O(1) for every item
+        """
+        team = self.battle_team
+        if isinstance(team, ArrayStack):
+            for i in range(len(team) - 1, -1, -1):
+                if team.array[i].is_alive():
+                    yield team.array[i]
+        elif isinstance(team, CircularQueue):
+            capacity = len(team.array)
+            for i in range(len(team)):
+                x = team.array[(team.front + i) % capacity]
                 if x.is_alive():
-                    temp[count] = x
-                    count += 1
-            for i in range(len(temp_stack)):
-                x = temp_stack.pop()
-                self.battle_team.push(x)
-        elif isinstance(self.battle_team, CircularQueue):
+                    yield x
+        elif team is not None:
+            for x in team:
+                if x is not None:
+                    yield x
+
+    def __iter__(self):
+        """
+        Iterates over the team exactly like indexing it from 0 does (which is how a for loop went through a PokeTeam
+        before it had __iter__): when battle_team is a stack or queue, the Pokemon still alive in battle order and then
+        None up to TEAM_LIMIT, when it is still the ArrayR of the chosen team, every slot of it, None included
+        Nothing is copied and the stack or queue is left untouched
+
+        Complexity: O(n) for best and worst case, n is the length of battle_team
+        """
+        if not isinstance(self.battle_team, (ArrayStack, CircularQueue)):
             for i in range(len(self.battle_team)):
-                x = self.battle_team.serve()
-                self.battle_team.append(x)
-                if x.is_alive():
-                    temp[count] = x
-                    count += 1
-        else:
-            temp = self.battle_team
-        return temp
+                yield self.battle_team[i]
+            return
+        count = 0
+        for x in self._alive():
+            yield x
+            count += 1
+        for _ in range(count, self.TEAM_LIMIT):
+            yield None
 
     def __getitem__(self, index: int):
         """
@@ -301,26 +351,35 @@ class PokeTeam:
 
         param arg1: index in the form of integer
 
-        Returns: the item on the index
+        Returns: the item on the index, None when the index is past the last Pokemon alive
 
-        Complexity: Depending on self.temp_copy()
+        Complexity: O(n) for worst case, the battle_team is walked without being copied
         """
-        temp = self.temp_copy()
-        return temp[index]
+        if not isinstance(self.battle_team, (ArrayStack, CircularQueue)):
+            return self.battle_team[index]
+        if index < 0:
+            index += 6
+        if not 0 <= index < 6:
+            raise IndexError("invalid index")
+        for x in self._alive():
+            if index == 0:
+                return x
+            index -= 1
+        return None
 
     def __len__(self):
         """
-        Get you the length of the battle_team
+        Get you the length of the battle_team, only the Pokemon still alive are counted
+        The count is taken on every call rather than kept in a counter, as Battle lowers health on the Pokemon
+        themselves (defend, both_minus_one) and a counter in the team would miss those faints
 
         Returns: length in the form of integer
 
-        Complexity: O(n) for best and worst case, as self.temp_copy() could be O(1) or O(n)
+        Complexity: O(n) for best and worst case, n is at most TEAM_LIMIT and nothing is copied
         """
-        temp = self.temp_copy()
         count = 0
-        for x in temp:
-            if x is not None:
-                count += 1
+        for _ in self._alive():
+            count += 1
         return count
 
     def __str__(self):
@@ -329,29 +388,40 @@ class PokeTeam:
 
         Returns: A string
 
-        Complexity: O(n) for best and worst case, as self.temp_copy() could be O(1) or O(n)
+        Complexity: O(n) for best and worst case, nothing is copied
         """
-        temp = self.temp_copy()
         string = ""
-        for i in temp:
-            if i is not None:
-                string += i.name + " "
+        for x in self._alive():
+            string += x.name + " "
         return string
 
 class Trainer:
     """
     This class contains the name, battle_team and poketypedex of a trainer
+
+    poketypedex keeps the registered types in registration order, registered_types holds the same types
+    as a BSet of PokeType.value + 1 (BSet elements start at 1), and registered_count is their number
+
+    COMPLETION_RATIOS[a][d] is the damage multiplier get_pokedex_completion() of an attacker with a registered types
+    over that of a defender with d, computed once from the same rounded completions (None when d is 0)
     """
+    __slots__ = ("name", "team", "poketypedex", "registered_types", "registered_count")
+    COMPLETION_RATIOS = tuple(tuple(round(attacking / len(PokeType), 2) / round(defending / len(PokeType), 2) if defending else None
+                                    for defending in range(len(PokeType) + 1))
+                              for attacking in range(len(PokeType) + 1))
 
-    def __init__(self, name) -> None:
+    def __init__(self, name, rng=None) -> None:
         """
         Initialize a new instance of trainer class
 
         param arg1: name of the trainer in string form
+        param arg2: the random generator the trainer's team is drawn from, the random module when not given
         """
         self.name = name
-        self.team = PokeTeam()
+        self.team = PokeTeam(rng)
         self.poketypedex = ArrayR(len(PokeType))
+        self.registered_types = BSet()
+        self.registered_count = 0
 
     def pick_team(self, method: str) -> None:
         """
@@ -369,6 +439,14 @@ class Trainer:
             self.team.choose_manually()
         else:
             raise Exception("Error")
+        self.register_team()
+
+    def register_team(self) -> None:
+        """
+        Registers every Pokemon of the trainer's team into poketypedex
+
+        Complexity: O(n) for both best and worst case, n is the size of the team
+        """
         for x in self.team:
             self.register_pokemon(x)
 
@@ -398,15 +476,14 @@ class Trainer:
 
         param arg1: a Pokemon class (son class)
 
-        Complexity:
-            Best case is O(1), when the Pokemon's type is already inside poketypedex, and it is the first one
-            Worst case is O(n), when the Pokemon's type is not in it, and there's already len(PokeType) - 1 element in the poketypedex
+        Complexity: O(1) for both best and worst case, membership is a single bit test in registered_types
         """
         if pokemon is not None:
-            try:
-                self.poketypedex.index(pokemon.get_poketype())  # check whether the pokemon's type is already in it, if it's not, ValueError will be returned
-            except ValueError:  # ValueError returned so it will be added into it
-                self.poketypedex[self.poketypedex.index(None)] = pokemon.get_poketype()
+            poketype = pokemon.get_poketype()
+            if poketype.value + 1 not in self.registered_types:
+                self.registered_types.add(poketype.value + 1)
+                self.poketypedex[self.registered_count] = poketype
+                self.registered_count += 1
 
     def get_pokedex_completion(self) -> float:
         """
@@ -414,17 +491,30 @@ class Trainer:
 
         Returns: float of the percentage completed
 
-        Complexity:
-            Best case is O(1) when there are no nothing inside poketypedex
-            Worst case is O(n) when the poketypedex is full
+        Complexity: O(1) for both best and worst case, the registered types are counted as they are registered
         """
-        count = 0
-        for x in self.poketypedex:
-            if x is not None:
-                count += 1
-            else:
-                break
-        return round((count / len(self.poketypedex)), 2)
+        return round((self.registered_count / len(self.poketypedex)), 2)
+
+    @staticmethod
+    def completion_ratio(attacking_count: int, defending_count: int) -> float:
+        """
+        The damage multiplier of an attacking trainer over a defending one, the same float as dividing their
+        get_pokedex_completion()
+
+        param arg1: registered_count of the attacking trainer
+        param arg2: registered_count of the defending trainer
+
+        Returns: the ratio of both pokedex completions
+
+        Raises:
+            ZeroDivisionError: when the defending trainer has registered nothing, as the division does
+
+        Complexity: O(1) for both best and worst case
+        """
+        ratio = Trainer.COMPLETION_RATIOS[attacking_count][defending_count]
+        if ratio is None:
+            raise ZeroDivisionError("float division by zero")
+        return ratio
 
     def __str__(self) -> str:
         """
@@ -4,6 +4,7 @@ This module contains PokeType, TypeEffectiveness and an abstract version of the
 
 __author__ = "Teh Yee Hong"
 
+import os
 from abc import ABC
 from enum import Enum
 from data_structures.referential_array import ArrayR
@@ -32,7 +33,48 @@ class PokeType(Enum):
 class TypeEffectiveness:
     """
     Represents the type effectiveness of one Pokemon type against another.
+
+    The matrix is parsed from FILE_PATH the first time it is needed and kept for the
+    whole process in a flat ArrayR, the entry for (attack, defend) lives at
+    attack.value * len(PokeType) + defend.value
     """
+    FILE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "type_effectiveness.csv")
+    _table = None
+
+    @classmethod
+    def load(cls, path: str = None) -> None:
+        """
+        Parses the type effectiveness csv file into the flat lookup table, replacing any table loaded before.
+        This is also the way to reload the matrix after the file has changed.
+
+        Parameters:
+            path (str): The csv file to read, FILE_PATH is used (and remembered) when it is not given.
+
+        Raises:
+            ValueError: If the file does not hold a len(PokeType) x len(PokeType) matrix below its header.
+
+        Complexity:
+            O(n^2) for both best and worst case, where n is len(PokeType), every cell of the matrix is read once
+        """
+        if path is not None:
+            cls.FILE_PATH = path
+        type_count = len(PokeType)
+        table = ArrayR(type_count * type_count)
+        with open(cls.FILE_PATH, "r") as file:
+            file.readline()  # the header only names the defending types, in PokeType order
+            row = 0
+            for line in file:
+                if line.strip() == "":
+                    continue
+                cells = line.strip().split(",")
+                if row >= type_count or len(cells) != type_count:
+                    raise ValueError(f"{cls.FILE_PATH} is not a {type_count}x{type_count} type effectiveness matrix")
+                for column in range(type_count):
+                    table[row * type_count + column] = float(cells[column])
+                row += 1
+        if row != type_count:
+            raise ValueError(f"{cls.FILE_PATH} is not a {type_count}x{type_count} type effectiveness matrix")
+        cls._table = table
 
     @classmethod
     def get_effectiveness(cls, attack_type: PokeType, defend_type: PokeType) -> float:
@@ -47,17 +89,12 @@ class TypeEffectiveness:
             float: The effectiveness of the attack, as a float value between 0 and 4.
 
         Complexity:
-            O(1) for best case, it occurs when the file (type_effectiveness.csv) has no lines, the loop would not even start
-            O(n) for worst case, it occurs when the file has 16 lines
-        """
-        table = ArrayR(16)
-        with open("type_effectiveness.csv", "r") as file:
-            line = 0
-            for x in file:
-                table.__setitem__(line, x.strip().split(","))
-                line += 1
-        effectiveness = float(table[attack_type.value + 1][defend_type.value])
-        return effectiveness
+            O(1) for best case, the table has already been loaded so it is a single index
+            O(n^2) for worst case, it occurs on the very first call when the file still has to be loaded
+        """
+        if cls._table is None:
+            cls.load()
+        return cls._table[attack_type.value * len(PokeType) + defend_type.value]
 
     def __len__(self) -> int:
         """
@@ -67,24 +104,24 @@ class TypeEffectiveness:
         """
         return len(PokeType)
 
-class Pokemon(ABC):  # pylint: disable=too-few-public-methods, too-many-instance-attributes
+class AbstractPokemon(ABC):
     """
-    Represents a base Pokemon class with properties and methods common to all Pokemon.
+    The behaviour shared by every Pokemon (getters, attack, defend, level_up, ...), without any storage of its own:
+    Pokemon keeps the stats in __slots__, pokemon_pool.PooledPokemon in the arrays of a PokemonPool.
+
+    damage_engine is an optional precomputed damage table (see damage_table.DamageTable),
+    when it is set attack() is served from it instead of evaluating the damage formula
     """
-    def __init__(self):
+    __slots__ = ()
+    damage_engine = None
+
+    def get_species(self):
         """
-        Initializes a new instance of the Pokemon class.
+        Returns the species class of the Pokemon, its own class unless it is a view on a Pokemon stored elsewhere
+
+        Complexity: O(1)
         """
-        self.health = None
-        self.level = None
-        self.poketype = None
-        self.battle_power = None
-        self.evolution_line = None
-        self.name = None
-        self.experience = None
-        self.defence = None
-        self.speed = None
-        self.max_hp = None
+        return type(self)
 
     def set_max_hp(self):
         """
@@ -177,6 +214,15 @@ class Pokemon(ABC):  # pylint: disable=too-few-public-methods, too-many-instance
         """
         return self.evolution_line
 
+    def get_evolution_stage(self) -> int:
+        """
+        Returns how many times the Pokemon has evolved since it was created.
+
+        Returns:
+            int: The number of evolutions applied to the Pokemon.
+        """
+        return self.evolution_stage
+
     def get_battle_power(self) -> int:
         """
         Returns the battle power of the Pokemon.
@@ -198,8 +244,28 @@ class Pokemon(ABC):  # pylint: disable=too-few-public-methods, too-many-instance
             float: The damage that this Pokemon inflicts on the other Pokemon during an attack.
 
         Complexity:
-            O(n) for both best and worst case. There's only mathematical operation here except for TypeEffectiveness.get_effectiveness(),
-            so it is dependent on that function, best case for the function should never happen, so it is O(n).
+            O(1) for both best and worst case, it is either one lookup in the damage_engine or
+            the damage formula in calculate_damage().
+        """
+        if self.damage_engine is not None:
+            effective_damage = self.damage_engine.lookup(self, other_pokemon)
+            if effective_damage is not None:
+                return effective_damage
+        return self.calculate_damage(other_pokemon)
+
+    def calculate_damage(self, other_pokemon) -> float:
+        """
+        Evaluates the damage formula for this Pokemon attacking the other Pokemon, without consulting the damage_engine.
+
+        Args:
+            other_pokemon (Pokemon): The Pokemon that this Pokemon is attacking.
+
+        Returns:
+            float: The damage that this Pokemon inflicts on the other Pokemon during an attack.
+
+        Complexity:
+            O(1) for both best and worst case. There's only mathematical operation here except for TypeEffectiveness.get_effectiveness(),
+            which is a single lookup once the effectiveness table has been loaded.
         """
         if other_pokemon.defence < (self.battle_power / 2):
             damage = self.battle_power - other_pokemon.defence
@@ -248,6 +314,7 @@ class Pokemon(ABC):  # pylint: disable=too-few-public-methods, too-many-instance
         self.speed *= 1.5
         self.defence *= 1.5
         self.name = self.evolution_line[self.evolution_line.index(self.name) + 1]
+        self.evolution_stage += 1
 
     def is_alive(self) -> bool:
         """
@@ -265,5 +332,64 @@ class Pokemon(ABC):  # pylint: disable=too-few-public-methods, too-many-instance
         """
         return f"{self.name} (Level {self.level}) with {self.get_health()} health and {self.get_experience()} experience"
 
+class Pokemon(AbstractPokemon):  # pylint: disable=too-few-public-methods, too-many-instance-attributes
+    """
+    Represents a base Pokemon class with properties and methods common to all Pokemon.
+
+    It keeps its stats in __slots__.
+
+    A subclass is only registered as a species when it is declared with species=True (the classes the pokemon module
+    creates from the species table are), so helper classes defined in tests or user code do not shift the positions
+    seeded random teams are drawn from, see species()
+    """
+    __slots__ = ("health", "level", "poketype", "battle_power", "evolution_line", "name", "experience",
+                 "defence", "speed", "max_hp", "evolution_stage")
+    _registry = []
+    _species = None
+
+    def __init_subclass__(cls, species: bool = False, **kwargs):
+        """
+        Registers a new subclass as a species when it is declared with species=True
+
+        Complexity: O(1)
+        """
+        super().__init_subclass__(**kwargs)
+        if species:
+            Pokemon._registry.append(cls)
+            Pokemon._species = None
+
+    @staticmethod
+    def species() -> tuple:
+        """
+        Returns every registered species in alphabetical order of class name, so the index of a species stays the same
+        for as long as no species is added
+
+        Returns:
+            tuple: The species classes.
+
+        Complexity:
+            O(1) for best case, the tuple was already built
+            O(n log n) for worst case, it occurs on the first call after a species was registered
+        """
+        if Pokemon._species is None:
+            Pokemon._species = tuple(sorted(Pokemon._registry, key=lambda cls: cls.__name__))
+        return Pokemon._species
+
+    def __init__(self):
+        """
+        Initializes a new instance of the Pokemon class.
+        """
+        self.health = None
+        self.level = None
+        self.poketype = None
+        self.battle_power = None
+        self.evolution_line = None
+        self.name = None
+        self.experience = None
+        self.defence = None
+        self.speed = None
+        self.max_hp = None
+        self.evolution_stage = 0
+
 if __name__ == '__main__':
     pass
@@ -0,0 +1,246 @@
+"""
+This module contains PokemonPool, a struct-of-arrays store for Pokemon stats, and PooledPokemon, the view handed out for each entry
+"""
+
+__author__ = "Teh Yee Hong"
+
+from array import array
+from pokemon import *
+
+
+class PokemonPool:
+    """
+    Keeps the stats of many Pokemon in parallel typed arrays instead of one __dict__ per Pokemon.
+
+    Entry i of every array belongs to the same Pokemon, float_flags records (one bit per stat) whether the value
+    stored in a float array was a Python float, so a view gives back 45 rather than 45.0 for a stat that is still an int.
+    The arrays are public so that whole-pool operations can run over them directly.
+    """
+    FLOAT_STATS = ("health", "max_hp", "battle_power", "defence", "speed")
+    _species = None
+    _species_index = None
+    _evolution_lines = None
+
+    def __init__(self) -> None:
+        """
+        Initializing a new, empty instance of PokemonPool
+        """
+        self.health = array("d")
+        self.max_hp = array("d")
+        self.battle_power = array("d")
+        self.defence = array("d")
+        self.speed = array("d")
+        self.float_flags = array("B")
+        self.level = array("i")
+        self.experience = array("i")
+        self.poketype = array("b")
+        self.species = array("h")
+        self.line_position = array("b")
+        self.evolution_stage = array("b")
+
+    @classmethod
+    def _load_species(cls) -> None:
+        """
+        Indexes every species from get_all_pokemon_types() together with its evolution line, done once per process
+
+        Complexity: O(n), n is the number of species
+        """
+        cls._species = get_all_pokemon_types()
+        cls._species_index = {}
+        lines = []
+        for i in range(len(cls._species)):
+            cls._species_index[cls._species[i]] = i
+            lines.append(cls._species[i]().evolution_line)
+        cls._evolution_lines = tuple(lines)
+
+    def add(self, pokemon: Pokemon) -> "PooledPokemon":
+        """
+        Copies a Pokemon into the pool
+
+        param arg1: a Pokemon of one of the species from get_all_pokemon_types()
+
+        Returns: the view of the new entry
+
+        Raises:
+            ValueError: when the Pokemon's class is not one of the species
+
+        Complexity: O(1) amortised
+        """
+        if PokemonPool._species is None:
+            PokemonPool._load_species()
+        species = PokemonPool._species_index.get(pokemon.get_species())
+        if species is None:
+            raise ValueError(f"{pokemon.get_species().__name__} is not a Pokemon species")
+        index = len(self)
+        self.species.append(species)
+        self.line_position.append(pokemon.evolution_line.index(pokemon.name))
+        self.evolution_stage.append(pokemon.evolution_stage)
+        self.level.append(pokemon.level)
+        self.experience.append(pokemon.experience)
+        self.poketype.append(pokemon.poketype.value)
+        self.float_flags.append(0)
+        for stat in self.FLOAT_STATS:
+            getattr(self, stat).append(0.0)
+        view = PooledPokemon(self, index)
+        for stat in self.FLOAT_STATS:
+            setattr(view, stat, getattr(pokemon, stat))
+        if pokemon.max_hp is None:  # set_max_hp() was never called on it
+            view.max_hp = pokemon.health
+        return view
+
+    def spawn(self, species) -> "PooledPokemon":
+        """
+        Creates a new Pokemon of the given species straight into the pool, with its maximum health set
+
+        param arg1: a Pokemon class from get_all_pokemon_types()
+
+        Returns: the view of the new entry
+
+        Complexity: O(1) amortised
+        """
+        pokemon = species()
+        pokemon.set_max_hp()
+        return self.add(pokemon)
+
+    def regenerate(self) -> None:
+        """
+        Restores the health of every Pokemon in the pool to its maximum health
+
+        Complexity: O(n) for both best and worst case, n is the size of the pool
+        """
+        health_flag = 1 << self.FLOAT_STATS.index("health")
+        max_hp_flag = 1 << self.FLOAT_STATS.index("max_hp")
+        self.health[:] = self.max_hp
+        for i in range(len(self)):
+            if self.float_flags[i] & max_hp_flag:
+                self.float_flags[i] |= health_flag
+            else:
+                self.float_flags[i] &= ~health_flag
+
+    def __getitem__(self, index: int) -> "PooledPokemon":
+        """
+        Returns a view of the Pokemon at the index
+
+        Complexity: O(1)
+        """
+        if not 0 <= index < len(self):
+            raise IndexError("PokemonPool index out of range")
+        return PooledPokemon(self, index)
+
+    def __len__(self) -> int:
+        """
+        Returns the number of Pokemon in the pool
+
+        Complexity: O(1)
+        """
+        return len(self.species)
+
+
+def _float_stat(stat: str) -> property:
+    """
+    Builds the property reading and writing one of PokemonPool.FLOAT_STATS for a PooledPokemon
+    """
+    flag = 1 << PokemonPool.FLOAT_STATS.index(stat)
+
+    def getter(self):
+        value = getattr(self.pool, stat)[self.index]
+        return value if self.pool.float_flags[self.index] & flag else int(value)
+
+    def setter(self, value):
+        getattr(self.pool, stat)[self.index] = value
+        if isinstance(value, float):
+            self.pool.float_flags[self.index] |= flag
+        else:
+            self.pool.float_flags[self.index] &= ~flag
+
+    return property(getter, setter)
+
+
+def _int_stat(stat: str) -> property:
+    """
+    Builds the property reading and writing an integer array of the PokemonPool for a PooledPokemon
+    """
+    def getter(self):
+        return getattr(self.pool, stat)[self.index]
+
+    def setter(self, value):
+        getattr(self.pool, stat)[self.index] = value
+
+    return property(getter, setter)
+
+
+class PooledPokemon(AbstractPokemon):
+    """
+    A lightweight view on one entry of a PokemonPool.
+
+    It only holds the pool and the index, every stat is read from and written to the pool's arrays,
+    so all the Pokemon methods (getters, attack, defend, level_up, ...) work unchanged on it. It derives from
+    AbstractPokemon rather than Pokemon, so it carries none of Pokemon's slots, and get_species() gives the species
+    it stands for, which is how DamageTable, BattleLog, BattleCache and the checkpoints recognise it.
+    """
+    __slots__ = ("pool", "index")
+
+    health = _float_stat("health")
+    max_hp = _float_stat("max_hp")
+    battle_power = _float_stat("battle_power")
+    defence = _float_stat("defence")
+    speed = _float_stat("speed")
+    level = _int_stat("level")
+    experience = _int_stat("experience")
+    evolution_stage = _int_stat("evolution_stage")
+
+    def __init__(self, pool: PokemonPool, index: int) -> None:
+        """
+        Initializing a view on the entry at index of the pool, the Pokemon itself must already be in the pool
+
+        param arg1: the PokemonPool holding the stats
+        param arg2: the index of the entry
+        """
+        self.pool = pool
+        self.index = index
+
+    @property
+    def poketype(self) -> PokeType:
+        """ The type of the Pokemon, stored as its PokeType value. """
+        return _POKETYPES[self.pool.poketype[self.index]]
+
+    @poketype.setter
+    def poketype(self, value: PokeType) -> None:
+        self.pool.poketype[self.index] = value.value
+
+    @property
+    def evolution_line(self):
+        """ The evolution line of the Pokemon, shared by every entry of the same species. """
+        return PokemonPool._evolution_lines[self.pool.species[self.index]]
+
+    @property
+    def name(self) -> str:
+        """ The name of the Pokemon, stored as its position in the evolution line. """
+        return self.evolution_line[self.pool.line_position[self.index]]
+
+    @name.setter
+    def name(self, value: str) -> None:
+        self.pool.line_position[self.index] = self.evolution_line.index(value)
+
+    def get_species(self):
+        """
+        Returns the Pokemon class this entry was created from
+
+        Complexity: O(1)
+        """
+        return PokemonPool._species[self.pool.species[self.index]]
+
+    def __eq__(self, other) -> bool:
+        """ Two views are equal when they look at the same entry of the same pool. """
+        return isinstance(other, PooledPokemon) and self.pool is other.pool and self.index == other.index
+
+    def __hash__(self) -> int:
+        """ Hashes the entry the view looks at. """
+        return hash((id(self.pool), self.index))
+
+
+_POKETYPES = tuple(PokeType)
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,140 @@
+"""
+This module contains StreamRandom, a counter-based random generator whose streams can be split and jumped
+"""
+
+__author__ = "Teh Yee Hong"
+
+import random
+
+MASK64 = (1 << 64) - 1
+GOLDEN_GAMMA = 0x9E3779B97F4A7C15
+
+
+def mix64(z: int) -> int:
+    """
+    The SplitMix64 finaliser, a bijection of 64 bit integers that scatters nearby inputs far apart
+
+    param arg1: a 64 bit integer
+
+    Returns: the mixed 64 bit integer
+
+    Complexity: O(1)
+    """
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+    return z ^ (z >> 31)
+
+
+class StreamRandom(random.Random):
+    """
+    A random.Random whose n-th 64 bit output is mix64(key + n * GOLDEN_GAMMA), the SplitMix64 sequence of key.
+
+    The whole state is (key, counter), so jump(n) skips n outputs in O(1) and split(i) derives the key of an
+    independent child stream from the parent key and i alone, whatever the parent has drawn so far.
+    Every method of random.Random (randint, choice, shuffle, ...) is built on random() and getrandbits() and works as usual.
+
+    Anything that takes an rng (PokeTeam, Trainer, BattleTower) defaults to the random module itself,
+    which keeps the sequences of random.seed() exactly as they were.
+    """
+
+    def __init__(self, seed: int = 0) -> None:
+        """
+        Initializing a new instance of StreamRandom
+
+        param arg1: the seed, any int, str or bytes, see seed()
+        """
+        self.key = 0
+        self.counter = 0
+        super().__init__(seed)
+
+    def seed(self, a=0, version=2) -> None:
+        """
+        Restarts the stream from a seed, ints are used as they are, anything else goes through random.Random first
+
+        param arg1: the seed
+
+        Complexity: O(1)
+        """
+        if not isinstance(a, int):
+            a = random.Random(a).getrandbits(64)
+        self.key = mix64(a & MASK64)
+        self.counter = 0
+        self.gauss_next = None
+
+    def next64(self) -> int:
+        """
+        Returns: the next 64 bit output of the stream
+
+        Complexity: O(1)
+        """
+        self.counter += 1
+        return mix64((self.key + self.counter * GOLDEN_GAMMA) & MASK64)
+
+    def random(self) -> float:
+        """
+        Returns: the next float in [0.0, 1.0), from the top 53 bits of one output
+
+        Complexity: O(1)
+        """
+        return (self.next64() >> 11) * (1.0 / (1 << 53))
+
+    def getrandbits(self, k: int) -> int:
+        """
+        Returns: an int of k random bits, one output per started 64 bits
+
+        Complexity: O(k)
+        """
+        if k < 0:
+            raise ValueError("number of bits must be non-negative")
+        value = 0
+        filled = 0
+        while filled < k:
+            value |= self.next64() << filled
+            filled += 64
+        return value & ((1 << k) - 1)
+
+    def jump(self, n: int) -> None:
+        """
+        Skips the next n outputs, as if next64() had been called n times
+
+        param arg1: the number of outputs to skip
+
+        Complexity: O(1)
+        """
+        self.counter += n
+
+    def split(self, index: int) -> "StreamRandom":
+        """
+        Returns an independent child stream, the same index always gives the same child
+
+        param arg1: the index of the child, e.g. the worker, the run or the battle
+
+        Returns: a new StreamRandom at the start of its stream
+
+        Complexity: O(1)
+        """
+        child = StreamRandom()
+        child.key = mix64((self.key ^ mix64((index * GOLDEN_GAMMA + GOLDEN_GAMMA) & MASK64)) & MASK64)
+        return child
+
+    def getstate(self) -> tuple:
+        """
+        Returns: the state of the stream, for setstate()
+
+        Complexity: O(1)
+        """
+        return self.key, self.counter, self.gauss_next
+
+    def setstate(self, state: tuple) -> None:
+        """
+        Restores a state from getstate()
+
+        param arg1: the state
+
+        Complexity: O(1)
+        """
+        self.key, self.counter, self.gauss_next = state
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,192 @@
+"""
+This module contains SpeciesTable, the compiled binary form of species.csv that the Pokemon species classes are generated from
+"""
+
+__author__ = "Teh Yee Hong"
+
+import os
+import struct
+import zlib
+from pokemon_base import PokeType
+
+
+class SpeciesTable:
+    """
+    Fixed-width binary table of every species, compiled from species.csv.
+
+    The file starts with a header (magic, version, number of species, crc32 of the csv it was compiled from)
+    followed by one RECORD per species, so species i can be read at HEADER.size + i * RECORD.size without
+    parsing anything else, and the file can be memory-mapped as it is.
+    species.bin is shipped next to species.csv and has to be written again with save() (python species_table.py)
+    whenever the csv is edited. A compiled file whose crc32 does not match the csv is stale and is compiled again, in
+    memory: opening the table never writes anything.
+    """
+    SOURCE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "species.csv")
+    COMPILED_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "species.bin")
+    MAGIC = b"PKSP"
+    VERSION = 1
+    HEADER = struct.Struct("<4sHHI")
+    # class name, evolution line ('|' separated), position of the name in the line, PokeType value,
+    # health, battle_power, defence, speed, level, experience, flags (bit i set when FLOAT_STATS[i] is a float)
+    RECORD = struct.Struct("<16s80sBBddddHHB")
+    FLOAT_STATS = ("health", "battle_power", "defence", "speed")
+    COLUMNS = ("class_name", "evolution_line", "name", "poketype", "health", "level", "battle_power", "defence", "speed", "experience")
+
+    def __init__(self, data: bytes) -> None:
+        """
+        Initializing a table over compiled bytes
+
+        param arg1: the compiled table, as written by compile()
+
+        Raises:
+            ValueError: when the bytes are not a compiled species table of this version
+        """
+        if len(data) < self.HEADER.size:
+            raise ValueError("not a compiled species table")
+        magic, version, count, self.source_crc = self.HEADER.unpack_from(data, 0)
+        if magic != self.MAGIC or version != self.VERSION or len(data) != self.HEADER.size + count * self.RECORD.size:
+            raise ValueError("not a compiled species table of version " + str(self.VERSION))
+        self.data = data
+        self.names = []
+        self.index = {}
+        for i in range(count):
+            class_name = self._text(self.RECORD.unpack_from(data, self.HEADER.size + i * self.RECORD.size)[0])
+            self.index[class_name] = i
+            self.names.append(class_name)
+        self.names = tuple(self.names)
+
+    @classmethod
+    def open(cls, source: str = None, compiled: str = None) -> "SpeciesTable":
+        """
+        Returns the table compiled from the csv, reading the compiled file when it is up to date
+        and compiling it again in memory otherwise
+
+        param arg1: the csv file, SOURCE_PATH when not given
+        param arg2: the compiled file, COMPILED_PATH when not given
+
+        Complexity:
+            O(n) for both best and worst case, n is the number of species, only the names are decoded up front
+        """
+        source = source if source is not None else cls.SOURCE_PATH
+        compiled = compiled if compiled is not None else cls.COMPILED_PATH
+        with open(source, "rb") as file:
+            source_crc = zlib.crc32(file.read())
+        try:
+            with open(compiled, "rb") as file:
+                table = cls(file.read())
+            if table.source_crc == source_crc:
+                return table
+        except (OSError, ValueError):
+            pass
+        return cls(cls.compile(source))
+
+    @classmethod
+    def save(cls, source: str = None, compiled: str = None) -> None:
+        """
+        Compiles the species csv and writes the compiled file, so that open() can read it instead of compiling
+
+        param arg1: the csv file, SOURCE_PATH when not given
+        param arg2: the compiled file, COMPILED_PATH when not given
+
+        Complexity: O(n) for both best and worst case, n is the number of species
+        """
+        compiled = compiled if compiled is not None else cls.COMPILED_PATH
+        data = cls.compile(source)
+        with open(compiled + ".tmp", "wb") as file:
+            file.write(data)
+        os.replace(compiled + ".tmp", compiled)
+
+    @classmethod
+    def compile(cls, source: str = None) -> bytes:
+        """
+        Compiles the species csv into the binary table
+
+        param arg1: the csv file, SOURCE_PATH when not given
+
+        Returns: the compiled bytes
+
+        Raises:
+            ValueError: when a row of the csv is not a valid species
+
+        Complexity: O(n) for both best and worst case, n is the number of species
+        """
+        source = source if source is not None else cls.SOURCE_PATH
+        with open(source, "rb") as file:
+            raw = file.read()
+        lines = [line.strip() for line in raw.decode("utf-8").splitlines() if line.strip() != ""]
+        if len(lines) == 0 or tuple(lines[0].split(",")) != cls.COLUMNS:
+            raise ValueError(f"{source} should start with the header {','.join(cls.COLUMNS)}")
+        records = bytearray()
+        for row, line in enumerate(lines[1:], start=2):
+            values = line.split(",")
+            if len(values) != len(cls.COLUMNS):
+                raise ValueError(f"{source}:{row} should have {len(cls.COLUMNS)} columns")
+            cells = dict(zip(cls.COLUMNS, values))
+            evolution_line = cells["evolution_line"].split("|")
+            if cells["name"] not in evolution_line:
+                raise ValueError(f"{source}:{row} {cells['name']} is not in its evolution line")
+            if len(cells["class_name"].encode("utf-8")) > 16 or len(cells["evolution_line"].encode("utf-8")) > 80:
+                raise ValueError(f"{source}:{row} class name or evolution line is too long for a record")
+            flags = 0
+            stats = []
+            for i, stat in enumerate(cls.FLOAT_STATS):
+                value = cls._number(cells[stat])
+                if isinstance(value, float):
+                    flags |= 1 << i
+                stats.append(value)
+            records += cls.RECORD.pack(cells["class_name"].encode("utf-8"), cells["evolution_line"].encode("utf-8"),
+                                       evolution_line.index(cells["name"]), PokeType[cells["poketype"]].value,
+                                       *stats, int(cells["level"]), int(cells["experience"]), flags)
+        return cls.HEADER.pack(cls.MAGIC, cls.VERSION, len(lines) - 1, zlib.crc32(raw)) + bytes(records)
+
+    def record(self, class_name: str):
+        """
+        Decodes the record of a species
+
+        param arg1: the class name of the species
+
+        Returns:
+            tuple: (class name, evolution line, name, PokeType value, health, battle_power, defence, speed, level, experience),
+            the stats keep the int or float type they were written with in the csv
+
+        Raises:
+            KeyError: when there is no such species
+
+        Complexity: O(1)
+        """
+        fields = self.RECORD.unpack_from(self.data, self.HEADER.size + self.index[class_name] * self.RECORD.size)
+        evolution_line = tuple(self._text(fields[1]).split("|"))
+        stats = []
+        for i in range(len(self.FLOAT_STATS)):
+            stats.append(fields[4 + i] if fields[10] & (1 << i) else int(fields[4 + i]))
+        return (self._text(fields[0]), evolution_line, evolution_line[fields[2]], fields[3], *stats, fields[8], fields[9])
+
+    def __len__(self) -> int:
+        """
+        Returns the number of species
+
+        Complexity: O(1)
+        """
+        return len(self.names)
+
+    @staticmethod
+    def _text(field: bytes) -> str:
+        """
+        Decodes a zero padded text field
+
+        Complexity: O(n), n is the width of the field
+        """
+        return field.rstrip(b"\0").decode("utf-8")
+
+    @staticmethod
+    def _number(text: str):
+        """
+        Parses a stat, keeping it an int unless it is written with a decimal point
+
+        Complexity: O(n), n is the length of the text
+        """
+        return float(text) if "." in text else int(text)
+
+
+if __name__ == '__main__':
+    SpeciesTable.save()
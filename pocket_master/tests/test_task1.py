@@ -2,7 +2,19 @@ import unittest
 from ed_utils.decorators import number, visibility
 from unittest.mock import patch
 from pokemon_base import TypeEffectiveness, PokeType
+import inspect
+import pokemon
+from pokemon import get_all_pokemon_types, Charmander, Squirtle
+from pokemon_base import Pokemon
+from species_table import SpeciesTable
+from damage_table import DamageTable
+from pokemon_pool import PokemonPool
+import checkpoint
 import io
+import sys
+import os
+import tempfile
+import zlib
 
 class TestTypeEffectiveness(unittest.TestCase):
     @number("1.1")
@@ -18,5 +30,167 @@ class TestTypeEffectiveness(unittest.TestCase):
     def test_len(self):
         self.assertEqual(len(TypeEffectiveness()), 15)
 
+    @number("1.3")
+    @visibility(visibility.VISIBILITY_SHOW)
+    def test_effectiveness_loaded_once(self):
+        TypeEffectiveness.get_effectiveness(PokeType.FIRE, PokeType.WATER)
+        with patch("builtins.open", side_effect=AssertionError("effectiveness file read again")):
+            self.assertEqual(TypeEffectiveness.get_effectiveness(PokeType.ELECTRIC, PokeType.GROUND), 0.0)
+            self.assertEqual(TypeEffectiveness.get_effectiveness(PokeType.ICE, PokeType.DRAGON), 1.0)
+
+    @number("1.4")
+    @visibility(visibility.VISIBILITY_SHOW)
+    def test_effectiveness_reload(self):
+        default_path = TypeEffectiveness.FILE_PATH
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "flat.csv")
+            with open(path, "w") as file:
+                file.write(",".join(t.name for t in PokeType) + "\n")
+                for _ in PokeType:
+                    file.write(",".join("1.0" for _ in PokeType) + "\n")
+            try:
+                TypeEffectiveness.load(path)
+                self.assertEqual(TypeEffectiveness.get_effectiveness(PokeType.WATER, PokeType.GRASS), 1.0)
+            finally:
+                TypeEffectiveness.load(default_path)
+        self.assertEqual(TypeEffectiveness.get_effectiveness(PokeType.WATER, PokeType.GRASS), 0.5)
+
+class TestSpeciesRegistry(unittest.TestCase):
+    @number("1.5")
+    @visibility(visibility.VISIBILITY_SHOW)
+    def test_alphabetical_order(self):
+        expected = [cls for _, cls in inspect.getmembers(pokemon, inspect.isclass) if cls != Pokemon and issubclass(cls, Pokemon)]
+        self.assertEqual(list(get_all_pokemon_types()), expected)
+        self.assertEqual(len(get_all_pokemon_types()), 77)
+        self.assertIs(get_all_pokemon_types(), get_all_pokemon_types())
+
+    @number("1.6")
+    @visibility(visibility.VISIBILITY_SHOW)
+    def test_opt_out(self):
+        species = get_all_pokemon_types()
+
+        class Helper(Pokemon):
+            pass
+
+        class Declared(Pokemon, species=False):
+            pass
+        self.assertNotIn(Helper, get_all_pokemon_types())
+        self.assertNotIn(Declared, get_all_pokemon_types())
+        self.assertIs(get_all_pokemon_types(), species, "defining a helper class should not change the species")
+
+
+class TestSpeciesTable(unittest.TestCase):
+    @number("1.7")
+    @visibility(visibility.VISIBILITY_SHOW)
+    def test_recompiles_changed_source(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, "species.csv")
+            compiled = os.path.join(directory, "species.bin")
+            with open(source, "w") as file:
+                file.write(",".join(SpeciesTable.COLUMNS) + "\n")
+                file.write("Mew,Mew,Mew,PSYCHIC,100,1,50,50,100.5,0\n")
+            self.assertEqual(SpeciesTable.open(source, compiled).record("Mew"), ("Mew", ("Mew",), "Mew", PokeType.PSYCHIC.value, 100, 50, 50, 100.5, 1, 0))
+            self.assertFalse(os.path.exists(compiled), "open() should not write the compiled file")
+            SpeciesTable.save(source, compiled)
+            self.assertEqual(SpeciesTable.open(source, compiled).record("Mew")[8], 1)
+            with open(source, "a") as file:
+                file.write("Mewtwo,Mewtwo,Mewtwo,PSYCHIC,106,1,110,90,130,0\n")
+            self.assertEqual(SpeciesTable.open(source, compiled).names, ("Mew", "Mewtwo"))
+
+        # the compiled table shipped with the game is up to date, so open() reads it instead of compiling the csv
+        with open(SpeciesTable.SOURCE_PATH, "rb") as file:
+            source_crc = zlib.crc32(file.read())
+        with open(SpeciesTable.COMPILED_PATH, "rb") as file:
+            self.assertEqual(SpeciesTable(file.read()).source_crc, source_crc, "run python species_table.py after editing species.csv")
+
+    @number("1.8")
+    @visibility(visibility.VISIBILITY_SHOW)
+    def test_generated_species(self):
+        charmander = Charmander()
+        self.assertIsInstance(charmander, Charmander)
+        self.assertIs(pokemon.Charmander, Charmander)
+        self.assertEqual(str(charmander), "Charmander (Level 1) with 39 health and 0 experience")
+        self.assertEqual(charmander.get_evolution(), ["Charmander", "Charmeleon", "Charizard"])
+
+    @number("1.9")
+    @visibility(visibility.VISIBILITY_SHOW)
+    def test_species_are_slotted(self):
+        for species in get_all_pokemon_types():
+            self.assertFalse(hasattr(species(), "__dict__"), f"{species.__name__} should not carry a __dict__")
+
+        class Custom(Pokemon, species=False):
+            def __init__(self):
+                super().__init__()
+                self.nickname = "Sparky"
+        self.assertEqual(Custom().nickname, "Sparky")
+
+
+class TestDamageTable(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.damage_table = DamageTable()
+
+    def tearDown(self):
+        DamageTable.disable()
+
+    @number("1.10")
+    @visibility(visibility.VISIBILITY_SHOW)
+    def test_matches_formula(self):
+        for attacker_cls in get_all_pokemon_types():
+            for defender_cls in get_all_pokemon_types():
+                attacker, defender = attacker_cls(), defender_cls()
+                self.assertEqual(self.damage_table.lookup(attacker, defender), attacker.calculate_damage(defender))
+
+    @number("1.11")
+    @visibility(visibility.VISIBILITY_SHOW)
+    def test_follows_evolution(self):
+        self.damage_table.enable()
+        attacker, defender = Charmander(), Squirtle()
+        for _ in range(2):
+            attacker.level_up()
+            defender.level_up()
+            self.assertEqual(attacker.attack(defender), attacker.calculate_damage(defender))
+            self.assertEqual(defender.attack(attacker), defender.calculate_damage(attacker))
+        self.assertEqual(attacker.get_evolution_stage(), 2)
+
+
+class TestPokemonPool(unittest.TestCase):
+    @number("1.12")
+    @visibility(visibility.VISIBILITY_SHOW)
+    def test_view_behaves_like_pokemon(self):
+        pool = PokemonPool()
+        pooled_attacker, pooled_defender = pool.spawn(Charmander), pool.spawn(Squirtle)
+        attacker, defender = Charmander(), Squirtle()
+        for _ in range(3):
+            self.assertEqual(pooled_attacker.attack(pooled_defender), attacker.attack(defender))
+            pooled_defender.defend(7)
+            defender.defend(7)
+            pooled_attacker.level_up()
+            attacker.level_up()
+        self.assertEqual(str(pooled_attacker), str(attacker))
+        self.assertEqual(str(pooled_defender), str(defender))
+        self.assertEqual(pooled_attacker.get_speed(), attacker.get_speed())
+        self.assertEqual(pooled_attacker.get_poketype(), PokeType.FIRE)
+
+        self.assertLess(sys.getsizeof(pooled_attacker), sys.getsizeof(attacker), "a view should be smaller than a Pokemon")
+        self.assertIs(pooled_attacker.get_species(), Charmander)
+        table = DamageTable()
+        table.build()
+        fresh = pool.spawn(Charmander)
+        self.assertEqual(table.lookup(fresh, pooled_defender), Charmander().calculate_damage(pooled_defender))
+        restored = checkpoint._decode_pokemon(checkpoint._encode_pokemon(pooled_attacker), {"Charmander": Charmander})
+        self.assertEqual(str(restored), str(attacker))
+
+    @number("1.13")
+    @visibility(visibility.VISIBILITY_SHOW)
+    def test_regenerate(self):
+        pool = PokemonPool()
+        pooled = pool.spawn(Squirtle)
+        pooled.defend(7)
+        pool.regenerate()
+        self.assertEqual(str(pool[0]), "Squirtle (Level 1) with 44 health and 0 experience")
+        self.assertEqual(pool[0], pooled)
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -5,6 +5,8 @@ from io import StringIO
 import random
 from poke_team import *
 from pokemon import *
+from data_structures.sorted_stack import SortedStack
+from data_structures.referential_array import ArrayR
 
 class TestPokeTeam(unittest.TestCase):
     @number("2.1")
@@ -33,6 +35,24 @@ class TestPokeTeam(unittest.TestCase):
         poketeam.choose_randomly()
         self.assertIsNotNone(poketeam[0], " Poketeam's __getitem__ not working correctly")
 
+    @number("2.8")
+    @visibility(visibility.VISIBILITY_SHOW)
+    def test_reading_leaves_battle_team_untouched(self):
+        poketeam = PokeTeam()
+        poketeam.choose_randomly()
+        poketeam.assemble_team(BattleMode.ROTATE)
+        queue = poketeam.battle_team
+        queue.append(queue.serve())
+        front, rear = queue.front, queue.rear
+        queue.array[(front + 1) % len(queue.array)].health = 0
+        expected = [queue.array[(front + i) % len(queue.array)] for i in range(6) if i != 1]
+
+        self.assertEqual(len(poketeam), 5)
+        self.assertEqual(list(poketeam), expected + [None], "iterating should give what indexing from 0 gives")
+        self.assertEqual([poketeam[i] for i in range(6)], expected + [None])
+        self.assertEqual(str(poketeam), "".join(pokemon.get_name() + " " for pokemon in expected))
+        self.assertEqual((queue.front, queue.rear, len(queue)), (front, rear, 6))
+
 class TestTrainer(unittest.TestCase):
     @number("2.4")
     @visibility(visibility.VISIBILITY_SHOW)
@@ -75,6 +95,125 @@ class TestTrainer(unittest.TestCase):
 
         self.assertEqual(str(trainer), expected_str, "Trainer Str method is not set up correctly")
 
+    @number("2.9")
+    @visibility(visibility.VISIBILITY_SHOW)
+    def test_register_keeps_order(self):
+        trainer = Trainer('Ash')
+        for pokemon in [Pikachu(), Pidgey(), Voltorb(), Aerodactyl(), Pikachu(), Squirtle()]:
+            trainer.register_pokemon(pokemon)
+        self.assertEqual([trainer.poketypedex[i] for i in range(4)], [PokeType.ELECTRIC, PokeType.FLYING, PokeType.ROCK, PokeType.WATER])
+        self.assertIsNone(trainer.poketypedex[4])
+        self.assertEqual(trainer.get_pokedex_completion(), 0.27)
+
+    @number("2.10")
+    @visibility(visibility.VISIBILITY_SHOW)
+    def test_completion_ratio_matches_division(self):
+        attacking, defending = Trainer('Gary'), Trainer('Ash')
+        self.assertRaises(ZeroDivisionError, Trainer.completion_ratio, attacking.registered_count, defending.registered_count)
+        for pokemon in [Pikachu(), Pidgey(), Voltorb(), Aerodactyl(), Squirtle()]:
+            attacking.register_pokemon(pokemon)
+            self.assertRaises(ZeroDivisionError, Trainer.completion_ratio, attacking.registered_count, defending.registered_count)
+            for other in [Bulbasaur(), Charmander(), Pikachu()]:
+                defending.register_pokemon(other)
+                self.assertEqual(Trainer.completion_ratio(attacking.registered_count, defending.registered_count),
+                                 attacking.get_pokedex_completion() / defending.get_pokedex_completion())
+            defending = Trainer('Ash')
+
+
+class TestSortedStack(unittest.TestCase):
+    @staticmethod
+    def full_resort(order, keys):
+        # what PokeTeam.assign_team() did before: pop everything into an ArraySortedList, push it back reversed
+        temp = ArraySortedList(6)
+        for item in reversed(order):
+            temp.add(ListItem(item, keys[item]))
+        return [temp[i].value for i in range(len(temp) - 1, -1, -1)]
+
+    @number("2.11")
+    @visibility(visibility.VISIBILITY_SHOW)
+    def test_reorder_matches_full_resort(self):
+        rng = random.Random(7)
+        for _ in range(300):
+            keys = {item: rng.randint(0, 8) for item in range(rng.randint(1, 6))}
+            stack = SortedStack(6, keys.__getitem__)
+            order = list(keys)
+            rng.shuffle(order)
+            for item in order:
+                stack.push(item)
+            for _ in range(10):
+                top = stack.peek()
+                keys[top] = rng.randint(0, 8)
+                if rng.random() < 0.2 and len(stack) > 1:
+                    stack.pop()
+                    order.pop()
+                stack.reorder()
+                order = self.full_resort(order, keys)
+                self.assertEqual([stack.array[i] for i in range(len(stack))], order)
+
+
+class TestArrayR(unittest.TestCase):
+
+    @number("2.12")
+    @visibility(visibility.VISIBILITY_SHOW)
+    def test_bulk_operations(self):
+        array = ArrayR(6)
+        array[0:4] = ["a", "b", "c", "d"]
+        self.assertEqual(array[:], ["a", "b", "c", "d", None, None])
+        array.shift(1, 4, 1)
+        self.assertEqual(array[:], ["a", "b", "b", "c", "d", None])
+        array.shift(2, 5, -1)
+        self.assertEqual(array[:], ["a", "b", "c", "d", "d", None])
+        with self.assertRaises(IndexError):
+            array.shift(3, 6, 1)
+        self.assertEqual(array.index("d"), 3)
+        self.assertEqual(array.index("d", 4), 4)
+        with self.assertRaises(ValueError):
+            array.index("d", 0, 3)
+        array.fill("z", 4)
+        self.assertEqual(array[:], ["a", "b", "c", "d", "z", "z"])
+        array.ensure_capacity(7)
+        self.assertEqual(len(array), 12, "growing should double the array")
+        self.assertEqual(array[:7], ["a", "b", "c", "d", "z", "z", None])
+        array.resize(2)
+        self.assertEqual(array[:], ["a", "b"])
+
+    @number("2.13")
+    @visibility(visibility.VISIBILITY_SHOW)
+    def test_sorted_list_shuffles(self):
+        rng = random.Random(3)
+        items = ArraySortedList(1)
+        expected = []
+        for _ in range(200):
+            if expected and rng.random() < 0.3:
+                position = rng.randrange(len(items))
+                expected.pop(position)
+                items.delete_at_index(position)
+            else:
+                key = rng.randint(0, 50)
+                items.add(ListItem(key, key))
+                expected.append(key)
+                expected.sort()
+            self.assertEqual([items[i].key for i in range(len(items))], expected)
+
+
+    @number("2.14")
+    @visibility(visibility.VISIBILITY_SHOW)
+    def test_from_items_matches_add(self):
+        rng = random.Random(5)
+        for _ in range(300):
+            spread = rng.choice([3, 1000])
+            first = [ListItem(i, rng.randint(0, spread)) for i in range(rng.randint(0, 4))]
+            more = [ListItem(i + 10, rng.randint(0, spread)) for i in range(rng.randint(0, 8))]
+            one_by_one = ArraySortedList(1)
+            for item in first + more:
+                one_by_one.add(item)
+            bulk = ArraySortedList.from_items(first)
+            bulk.extend(more)
+            self.assertEqual([bulk[i].value for i in range(len(bulk))], [one_by_one[i].value for i in range(len(one_by_one))])
+        unhashable = ArraySortedList.from_items([ListItem("b", [2])])
+        unhashable.extend([ListItem("c", [3]), ListItem("a", [1])])
+        self.assertEqual([unhashable[i].value for i in range(len(unhashable))], ["a", "b", "c"])
+
 
 if __name__ == '__main__':
     unittest.main()
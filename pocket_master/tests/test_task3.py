@@ -5,6 +5,16 @@ import random
 from poke_team import *
 from pokemon import *
 from battle import *
+from instrumentation import BattleProfiler
+from battle_cache import BattleCache, members, pokemon_state
+from battle_log import BattleLog, BattleReplay, STATS
+from battle_service import BattleService, BattleClient, play, play_batch, random_request
+from rng import StreamRandom
+from matchup_matrix import MatchupMatrix
+import asyncio
+import json
+import os
+import tempfile
 from typing import Tuple
 
 
@@ -136,5 +146,291 @@ class TestBattle(unittest.TestCase):
         self.assertEqual(len(self.trainer2.get_team()), 0, f"{self.trainer2.get_name()} should have no Pokemon left in their team")
 
 
+    @number("3.11")
+    @visibility(visibility.VISIBILITY_SHOW)
+    def test_set_fast_forward_matches_stepwise(self):
+        results = []
+        for fast_forward in (False, True):
+            Battle.FAST_FORWARD = fast_forward
+            try:
+                random.seed(TestBattle.DEFAULT_SEED)
+                outcomes = []
+                for i in range(30):
+                    trainer1, trainer2 = Trainer('Gary'), Trainer('Ash')
+                    battle = Battle(trainer1, trainer2, BattleMode.SET)
+                    battle._create_teams()
+                    winner = battle.commence_battle()
+                    outcomes.append((winner is trainer1, winner is trainer2, [repr((x.name, x.health, x.level)) for x in trainer1.team.team],
+                                     [repr((x.name, x.health, x.level)) for x in trainer2.team.team]))
+                results.append(outcomes)
+            finally:
+                Battle.FAST_FORWARD = True
+        self.assertEqual(results[1], results[0])
+
+        battle = self.__create_teams(BattleMode.SET)
+        p1, p2 = battle.team1.peek(), battle.team2.peek()
+        self.trainer1.register_pokemon(p2)
+        self.trainer2.register_pokemon(p1)
+        p1.health, p2.health = 1000, 1000
+        self.assertGreater(battle.fast_forward(p1, p2), 0)
+        p1.health = 1000 / 3
+        self.assertEqual(battle.fast_forward(p1, p2), 0, "health that is not a short binary fraction should not be skipped")
+
+
+class TestBattleProfiler(unittest.TestCase):
+
+    def __battle(self, battle_mode: BattleMode, profiler=None) -> Tuple[Trainer, float, float]:
+        random.seed(TestBattle.DEFAULT_SEED)
+        trainer1, trainer2 = Trainer('Gary'), Trainer('Ash')
+        battle = Battle(trainer1, trainer2, battle_mode, profiler=profiler)
+        battle._create_teams()
+        winner = battle.commence_battle()
+        return winner.get_name() if winner is not None else None, trainer1.get_pokedex_completion(), trainer2.get_pokedex_completion()
+
+    @number("3.12")
+    @visibility(visibility.VISIBILITY_SHOW)
+    def test_profiler_counts(self):
+        for battle_mode in BattleMode:
+            profiler = BattleProfiler()
+            self.assertEqual(self.__battle(battle_mode, profiler), self.__battle(battle_mode), f"{battle_mode} profiled battle differs")
+            calls = profiler.summary()["calls"]
+            self.assertEqual(profiler.summary()["battles"], 1)
+            self.assertGreater(calls["actual_battle"]["calls"], 0)
+            self.assertEqual(calls["register_pokemon"]["calls"], 2 * calls["actual_battle"]["calls"])
+            expected = 2 * calls["actual_battle"]["calls"] if battle_mode == BattleMode.OPTIMISE else 0
+            self.assertEqual(calls["assign_team"]["calls"], expected)
+
+    @number("3.13")
+    @visibility(visibility.VISIBILITY_SHOW)
+    def test_profiler_detaches(self):
+        register_pokemon, get_effectiveness = Trainer.__dict__["register_pokemon"], TypeEffectiveness.__dict__["get_effectiveness"]
+        profiler = BattleProfiler()
+        self.__battle(BattleMode.SET, profiler)
+        self.assertIs(Trainer.__dict__["register_pokemon"], register_pokemon)
+        self.assertIs(TypeEffectiveness.__dict__["get_effectiveness"], get_effectiveness)
+        self.assertNotIn("actual_battle", vars(Battle(Trainer('Gary'), Trainer('Ash'), BattleMode.SET)))
+        trace = profiler.chrome_trace()["traceEvents"]
+        self.assertEqual(len(trace), sum(count["calls"] for count in profiler.summary()["calls"].values()))
+        self.assertTrue(all(event["ph"] == "X" and event["dur"] >= 0 for event in trace))
+
+
+class TestBattleCache(unittest.TestCase):
+
+    def __battle(self, battle_mode: BattleMode, seed: int, cache=None):
+        random.seed(seed)
+        trainer1, trainer2 = Trainer('Gary'), Trainer('Ash')
+        battle = Battle(trainer1, trainer2, battle_mode, "speed", cache=cache)
+        battle._create_teams()
+        winner = battle.commence_battle()
+        return (winner.get_name() if winner is not None else None,
+                [([pokemon_state(x) for x in members(trainer.get_team().battle_team)], [pokemon_state(x) for x in trainer.get_team().team],
+                  [trainer.poketypedex[i] for i in range(trainer.registered_count)]) for trainer in (trainer1, trainer2)])
+
+    @number("3.14")
+    @visibility(visibility.VISIBILITY_SHOW)
+    def test_replay_matches_battle(self):
+        for battle_mode in BattleMode:
+            cache = BattleCache()
+            for seed in range(10):
+                fought = self.__battle(battle_mode, seed)
+                self.assertEqual(self.__battle(battle_mode, seed, cache), fought, f"{battle_mode} cached battle differs")
+                self.assertEqual(self.__battle(battle_mode, seed, cache), fought, f"{battle_mode} replayed battle differs")
+            self.assertEqual((cache.hits, cache.misses), (10, 10))
+            self.assertEqual(cache.hit_rate(), 0.5)
+
+    @number("3.15")
+    @visibility(visibility.VISIBILITY_SHOW)
+    def test_least_recently_used_evicted(self):
+        cache = BattleCache(max_entries=2)
+        self.__battle(BattleMode.SET, 1, cache)
+        self.__battle(BattleMode.SET, 2, cache)
+        self.__battle(BattleMode.SET, 1, cache)
+        self.__battle(BattleMode.SET, 3, cache)
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.__battle(BattleMode.SET, 1, cache)
+        self.assertEqual(cache.hits, 2, "the battle replayed last should have been kept")
+        self.__battle(BattleMode.SET, 2, cache)
+        self.assertEqual(cache.misses, 4, "the least recently used battle should have been dropped")
+
+
+class TestBattleLog(unittest.TestCase):
+
+    @number("3.16")
+    @visibility(visibility.VISIBILITY_SHOW)
+    def test_replay_rebuilds_final_state(self):
+        log = BattleLog()
+        battles = []
+        random.seed(TestBattle.DEFAULT_SEED)
+        for battle_mode in BattleMode:
+            trainer1, trainer2 = Trainer('Gary'), Trainer('Ash')
+            battle = Battle(trainer1, trainer2, battle_mode, log=log)
+            battle._create_teams()
+            teams = (members(battle.team1), members(battle.team2))
+            winner = battle.commence_battle()
+            battles.append((None if winner is None else 1 if winner is trainer1 else 2, teams, (trainer1, trainer2)))
+
+        replay = BattleReplay(log.getvalue())
+        self.assertEqual(len(replay), len(battles))
+        for i, (winner, teams, trainers) in enumerate(battles):
+            state = replay.state(i)
+            self.assertTrue(state.ended)
+            self.assertEqual(state.winner, winner)
+            for side in (1, 2):
+                self.assertEqual(state.get_pokedex_completion(side), trainers[side - 1].get_pokedex_completion())
+                for pokemon, replayed in zip(teams[side - 1], state.sides[side - 1]):
+                    self.assertEqual([getattr(replayed, name) for name in STATS], [getattr(pokemon, name) for name in STATS])
+                    self.assertEqual(replayed.get_name(), pokemon.get_name())
+                    self.assertEqual(replayed.fainted, not pokemon.is_alive())
+
+    @number("3.17")
+    @visibility(visibility.VISIBILITY_SHOW)
+    def test_replay_intermediate_state(self):
+        log = BattleLog()
+        random.seed(TestBattle.DEFAULT_SEED)
+        battle = Battle(Trainer('Gary'), Trainer('Ash'), BattleMode.SET, log=log)
+        battle._create_teams()
+        battle.commence_battle()
+        replay = BattleReplay(log.getvalue())
+        events = list(replay.events(0))
+        first_damage = [kind for kind, _, _, _, _ in events].index("damage")
+        _, side, slot, _, health = events[first_damage]
+        self.assertEqual(replay.state(0, first_damage + 1).sides[side - 1][slot].health, health)
+        self.assertFalse(replay.state(0, first_damage + 1).ended)
+        self.assertNotIn("both_minus_one", vars(battle), "the log should detach after the battle")
+        with self.assertRaises(ValueError):
+            BattleReplay(b"not a log")
+
+
+class TestBattleService(unittest.TestCase):
+
+    @number("3.18")
+    @visibility(visibility.VISIBILITY_SHOW)
+    def test_service_matches_play(self):
+        rng = StreamRandom(TestBattle.DEFAULT_SEED)
+        battles = [random_request(rng) for _ in range(20)]
+
+        async def serve_and_ask():
+            service = BattleService(port=0, workers=0, batch_size=8)
+            host, port = await service.start()
+            client = BattleClient(host, port)
+            await client.connect()
+            responses = await asyncio.gather(*[client.battle(*battle) for battle in battles])
+            invalid = await client.battle(["Charmander"], ["NotAPokemon"])
+            await client.close()
+            await service.close()
+            return responses, invalid, service.batches
+
+        responses, invalid, batches = asyncio.run(serve_and_ask())
+        for i, ((team1, team2, mode, criterion), response) in enumerate(zip(battles, responses)):
+            expected = play({"id": i, "team1": team1, "team2": team2, "mode": mode, "criterion": criterion})
+            self.assertEqual(response, expected)
+        self.assertIn("error", invalid)
+        self.assertLess(batches, len(battles) + 1, "requests in flight together should be batched")
+
+    @number("3.19")
+    @visibility(visibility.VISIBILITY_SHOW)
+    def test_client_fails_on_malformed_response(self):
+        async def answer(reader, writer):
+            await reader.readline()
+            writer.write(b'{"no id": true}\n')
+            await writer.drain()
+            writer.close()
+
+        async def ask():
+            server = await asyncio.start_server(answer, "127.0.0.1", 0)
+            client = BattleClient(*server.sockets[0].getsockname()[:2])
+            await client.connect()
+            try:
+                with self.assertRaises(ValueError):
+                    await asyncio.wait_for(client.battle(["Charmander"], ["Squirtle"]), 5)
+                with self.assertRaises(ValueError):
+                    await client.battle(["Charmander"], ["Squirtle"])
+            finally:
+                await client.close()
+                server.close()
+                await server.wait_closed()
+
+        asyncio.run(ask())
+
+    @number("3.20")
+    @visibility(visibility.VISIBILITY_SHOW)
+    def test_service_survives_failures(self):
+        requests = [{"id": i, "team1": ["Charmander"], "team2": ["Squirtle"]} for i in range(2)]
+        commence_battle = Battle.commence_battle
+        battles = []
+
+        def first_fails(battle):
+            battles.append(battle)
+            if len(battles) == 1:
+                raise RuntimeError("boom")
+            return commence_battle(battle)
+
+        with patch.object(Battle, "commence_battle", first_fails):
+            responses = play_batch(requests)
+        self.assertEqual(responses[0], {"id": 0, "error": "RuntimeError: boom"})
+        self.assertEqual(responses[1], play(requests[1]))
+
+        async def oversized():
+            service = BattleService(port=0, workers=0)
+            host, port = await service.start()
+            reader, writer = await asyncio.open_connection(host, port)
+            try:
+                writer.write(b"x" * (2 ** 17) + b"\n")
+                await writer.drain()
+                return await asyncio.wait_for(reader.readline(), 5), await asyncio.wait_for(reader.read(), 5)
+            finally:
+                writer.close()
+                await service.close()
+
+        with self.assertLogs("battle_service", "WARNING"):
+            response, rest = asyncio.run(oversized())
+        self.assertIn("error", json.loads(response))
+        self.assertEqual(rest, b"", "the service should close the connection after an oversized line")
+
+
+class TestMatchupMatrix(unittest.TestCase):
+
+    @number("3.21")
+    @visibility(visibility.VISIBILITY_SHOW)
+    def test_matchups_match_stepwise(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "matchups.bin")
+            built = MatchupMatrix.open(path)
+            self.assertFalse(os.path.exists(path), "open() should not write anything")
+            built.save(path)
+            matrix = MatchupMatrix.open(path)
+        self.assertEqual(matrix.winner, built.winner)
+        self.assertEqual(matrix.float_flags, built.float_flags)
+        self.assertEqual(matrix.rounds, built.rounds)
+        self.assertTrue(all(matrix.rounds), "every duel takes at least one exchange")
+        self.assertEqual(matrix.health1, built.health1)
+        self.assertEqual(matrix.stats, built.stats)
+        self.assertRaises(ValueError, MatchupMatrix.from_bytes, b"PKMM" + matrix.to_bytes()[4:-1])
+        self.assertRaises(ValueError, MatchupMatrix([(1, 2)] * 100).build)
+
+        lookups = []
+        duel = matrix.duel
+        matrix.duel = lambda battle, p1, p2: lookups.append(duel(battle, p1, p2)) or lookups[-1]
+        results = []
+        for matchups in (None, matrix):
+            if matchups is not None:
+                matchups.enable()
+            try:
+                random.seed(TestBattle.DEFAULT_SEED)
+                outcomes = []
+                for i in range(100):
+                    trainer1, trainer2 = Trainer('Gary'), Trainer('Ash')
+                    battle = Battle(trainer1, trainer2, BattleMode.SET)
+                    battle._create_teams()
+                    winner = battle.commence_battle()
+                    outcomes.append(repr((winner is trainer1, winner is trainer2, [pokemon_state(x) for x in members(battle.team1)],
+                                          [pokemon_state(x) for x in members(battle.team2)])))
+                results.append(outcomes)
+            finally:
+                MatchupMatrix.disable()
+        self.assertEqual(results[1], results[0])
+        self.assertTrue(any(lookup is not None for lookup in lookups), "some duels should be looked up")
+
+
 if __name__ == '__main__':
     unittest.main()
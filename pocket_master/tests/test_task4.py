@@ -5,6 +5,13 @@ import random
 from poke_team import *
 from pokemon import *
 from tower import *
+from tournament import Tournament
+from rng import StreamRandom
+import asyncio
+import time
+import os
+import tempfile
+import checkpoint
 
 
 class TestTower(unittest.TestCase):
@@ -56,5 +63,216 @@ class TestTower(unittest.TestCase):
         self.player_trainer.get_team().regenerate_team(BattleMode.OPTIMISE, criterion="defence")
         self.assertEqual(str(self.player_trainer.get_team()[0]), "Kingler (Level 21) with 30 health and 0 experience")
 
+class TestTournament(unittest.TestCase):
+    @number("4.5")
+    @visibility(visibility.VISIBILITY_SHOW)
+    def test_reproducible_across_workers(self):
+        serial = sorted(Tournament(num_runs=4, num_enemies=3, base_seed=TestTower.DEFAULT_SEED, workers=0).results())
+        parallel = sorted(Tournament(num_runs=4, num_enemies=3, base_seed=TestTower.DEFAULT_SEED, workers=2).results())
+        self.assertEqual(serial, parallel, "Tournament runs should not depend on the number of workers")
+        self.assertEqual([run for run, _, _, _ in serial], [0, 1, 2, 3])
+
+
+class TestStreamRandom(unittest.TestCase):
+
+    def __tower(self, rng=None):
+        challenger = Trainer('Ash', rng)
+        challenger.pick_team("Random")
+        challenger.get_team().assemble_team(BattleMode.ROTATE)
+        tower = BattleTower(rng)
+        tower.set_my_trainer(challenger)
+        tower.generate_enemy_trainers(4)
+        outcomes = []
+        while tower.battles_remaining():
+            outcomes.append(tower.next_battle())
+        return outcomes
+
+    @number("4.6")
+    @visibility(visibility.VISIBILITY_SHOW)
+    def test_injected_rng(self):
+        random.seed(TestTower.DEFAULT_SEED)
+        default = self.__tower()
+        random.seed(TestTower.DEFAULT_SEED)
+        self.assertEqual(self.__tower(random), default, "the random module should reproduce the default sequence")
+
+        random.seed(TestTower.DEFAULT_SEED)
+        state = random.getstate()
+        first = self.__tower(StreamRandom(5))
+        self.assertEqual(random.getstate(), state, "a StreamRandom should leave the global stream untouched")
+        self.assertEqual(self.__tower(StreamRandom(5)), first)
+
+    @number("4.7")
+    @visibility(visibility.VISIBILITY_SHOW)
+    def test_split_and_jump(self):
+        jumped, stepped = StreamRandom(3), StreamRandom(3)
+        jumped.jump(100)
+        for _ in range(100):
+            stepped.next64()
+        self.assertEqual(jumped.next64(), stepped.next64())
+
+        parent = StreamRandom(3)
+        child = parent.split(1).random()
+        parent.random()
+        self.assertEqual(parent.split(1).random(), child, "a child should only depend on the parent seed and its index")
+        self.assertNotEqual(parent.split(2).random(), child)
+
+        rng = StreamRandom(3)
+        rng.random()
+        copy = StreamRandom()
+        copy.setstate(rng.getstate())
+        self.assertEqual([copy.randint(1, 6) for _ in range(20)], [rng.randint(1, 6) for _ in range(20)])
+
+
+class TestTowerStream(unittest.TestCase):
+
+    def __tower(self) -> BattleTower:
+        challenger = Trainer('Ash', StreamRandom(8))
+        challenger.pick_team("Random")
+        challenger.get_team().assemble_team(BattleMode.ROTATE)
+        tower = BattleTower(StreamRandom(9))
+        tower.set_my_trainer(challenger)
+        tower.generate_enemy_trainers(6)
+        return tower
+
+    def __polled(self) -> list:
+        tower = self.__tower()
+        results = []
+        while tower.battles_remaining():
+            results.append(tower.next_battle())
+        return results
+
+    @number("4.8")
+    @visibility(visibility.VISIBILITY_SHOW)
+    def test_battles_generator(self):
+        expected = self.__polled()
+        self.assertEqual(list(self.__tower()), expected)
+
+        tower = self.__tower()
+        results = tower.battles()
+        first = [next(results), next(results)]
+        progress = (len(tower.enemies), tower.enemies_defeated(), tower.the_trainer.key)
+        results.close()
+        self.assertEqual((len(tower.enemies), tower.enemies_defeated(), tower.the_trainer.key), progress, "no battle should be played after closing")
+        self.assertEqual(first + list(tower.battles()), expected, "a cancelled tower should carry on from where it stopped")
+        self.assertEqual(list(self.__tower().battles(max_battles=3)), expected[:3])
+
+    @number("4.9")
+    @visibility(visibility.VISIBILITY_SHOW)
+    def test_async_stream(self):
+        expected = self.__polled()
+
+        async def consume(limit=None):
+            results = []
+            async for result in self.__tower().stream():
+                results.append(result)
+                if len(results) == limit:
+                    break
+            return results
+        self.assertEqual(asyncio.run(consume()), expected)
+        self.assertEqual(asyncio.run(consume(2)), expected[:2])
+
+        async def ticks_during_battles():
+            ticks = 0
+            done = asyncio.Event()
+
+            async def tick():
+                nonlocal ticks
+                while not done.is_set():
+                    ticks += 1
+                    await asyncio.sleep(0)
+
+            ticker = asyncio.create_task(tick())
+            tower = self.__tower()
+            next_battle = tower.next_battle
+
+            def slow_battle():
+                time.sleep(0.05)
+                return next_battle()
+            tower.next_battle = slow_battle
+            results = [result async for result in tower.stream(max_battles=2)]
+            done.set()
+            await ticker
+            return results, ticks
+        results, ticks = asyncio.run(ticks_during_battles())
+        self.assertEqual(results, expected[:2])
+        self.assertGreater(ticks, 10, "the event loop should run while a battle is played")
+
+
+    @number("4.10")
+    @visibility(visibility.VISIBILITY_SHOW)
+    def test_lazy_enemies_match_eager(self):
+        rng = StreamRandom(4)
+        eager = []
+        for count in range(5):
+            enemy = Trainer(f"Trainer {count}", rng)
+            enemy.pick_team("Random")
+            eager.append((enemy.get_name(), str(enemy.get_team()), str(enemy), rng.randint(BattleTower.MIN_LIVES, BattleTower.MAX_LIVES)))
+
+        tower = BattleTower(StreamRandom(4))
+        tower.generate_enemy_trainers(5)
+        self.assertEqual(tower.enemies.fresh, 0, "no enemy should be built before it is served")
+        lazy = []
+        while not tower.enemies.is_empty():
+            enemy = tower.enemies.serve()
+            lazy.append((enemy.value.get_name(), str(enemy.value.get_team()), str(enemy.value), enemy.key))
+        self.assertEqual(lazy, eager)
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def __tower(self, rng, challenger_rng=None) -> BattleTower:
+        challenger = Trainer('Ash', rng if challenger_rng is None else challenger_rng)
+        challenger.pick_team("Random")
+        challenger.get_team().assemble_team(BattleMode.ROTATE)
+        tower = BattleTower(rng)
+        tower.set_my_trainer(challenger)
+        tower.generate_enemy_trainers(8)
+        return tower
+
+    @number("4.11")
+    @visibility(visibility.VISIBILITY_SHOW)
+    def test_resume_gives_same_results(self):
+        for played in (0, 2, 5):
+            random.seed(TestTower.DEFAULT_SEED)
+            for tower in (self.__tower(StreamRandom(played)), self.__tower(random)):
+                list(tower.battles(played))
+                data = checkpoint.encode(tower)
+                rest = list(tower) + [tower.enemies_defeated(), tower.rng.random()]
+                resumed = checkpoint.decode(data)
+                self.assertEqual(list(resumed) + [resumed.enemies_defeated(), resumed.rng.random()], rest)
+
+            tower = self.__tower(StreamRandom(played), StreamRandom(8))
+            list(tower.battles(played))
+            resumed = checkpoint.decode(checkpoint.encode(tower))
+            challenger, resumed_challenger = tower.the_trainer.value, resumed.the_trainer.value
+            self.assertIsNot(resumed_challenger.get_team().rng, resumed.rng, "the challenger should keep its own generator")
+            challenger.get_team().regenerate_team(BattleMode.ROTATE)
+            resumed_challenger.get_team().regenerate_team(BattleMode.ROTATE)
+            draws = [challenger.get_team().rng.random() for _ in range(3)]
+            self.assertEqual([resumed_challenger.get_team().rng.random() for _ in range(3)], draws)
+            self.assertEqual(list(resumed), list(tower))
+        with self.assertRaises(ValueError):
+            checkpoint.decode(b"PKCP")
+
+    @number("4.12")
+    @visibility(visibility.VISIBILITY_SHOW)
+    def test_auto_checkpoint(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "tower.ckpt")
+            tower = self.__tower(StreamRandom(1))
+            auto = checkpoint.AutoCheckpoint(path, every=2)
+            results = list(tower.battles(max_battles=5, checkpoint=auto))
+            self.assertEqual(auto.saves, len(results) // 2)
+            self.assertEqual(os.listdir(directory), ["tower.ckpt"], "the temporary file should have replaced the checkpoint")
+            resumed = checkpoint.load(path)
+            self.assertEqual(resumed.enemies_defeated(), sum(1 for result in results[:auto.saves * 2] if result[0] != result[2]))
+
+            os.remove(path)
+            auto = checkpoint.AutoCheckpoint(path, max_overhead=1e-9)
+            self.assertFalse(auto.after_battle(self.__tower(StreamRandom(2))), "the first battle should not save past the budget")
+            self.assertIsNotNone(auto.save_seconds)
+            self.assertFalse(os.path.exists(path))
+
+
 if __name__ == '__main__':
     unittest.main()
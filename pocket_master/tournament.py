@@ -0,0 +1,119 @@
+"""
+This module contains Tournament, which runs many independent BattleTower runs across worker processes
+"""
+
+__author__ = "Teh Yee Hong"
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Iterator, Tuple
+from poke_team import Trainer
+from tower import BattleTower
+from battle_mode import BattleMode
+from rng import StreamRandom
+
+
+def run_tower(run: int, seed: int, num_enemies: int) -> Tuple[int, int, int, int]:
+    """
+    Plays one whole BattleTower run, the challenger and the enemies are all drawn from a StreamRandom of the given seed,
+    the global random stream is left untouched
+
+    param arg1: the index of the run in its tournament
+    param arg2: the seed of the run
+    param arg3: the number of enemies in the tower
+
+    Returns:
+        int: the index of the run
+        int: the seed of the run
+        int: the number of enemies defeated
+        int: the challenger's lives left
+
+    Complexity: O(n^2) for both cases, as many battles as the tower holds
+    """
+    rng = StreamRandom(seed)
+    challenger = Trainer(f"Challenger {run}", rng)
+    challenger.pick_team("Random")
+    challenger.get_team().assemble_team(BattleMode.ROTATE)
+    tower = BattleTower(rng)
+    tower.set_my_trainer(challenger)
+    tower.generate_enemy_trainers(num_enemies)
+    while tower.battles_remaining():
+        tower.next_battle()
+    return run, seed, tower.enemies_defeated(), tower.the_trainer.key
+
+
+class Tournament:
+    """
+    Shards independent BattleTower runs over a ProcessPoolExecutor.
+
+    Every run gets its own seed, split from the StreamRandom of base_seed by the index of the run only,
+    and draws from its own stream instead of the process wide random module,
+    so the outcome of a run does not depend on the number of workers nor on which worker plays it.
+    """
+
+    def __init__(self, num_runs: int, num_enemies: int, base_seed: int = 0, workers: int = None) -> None:
+        """
+        Initializing a new instance of Tournament
+
+        param arg1: the number of tower runs
+        param arg2: the number of enemies in every tower
+        param arg3: the seed every run's seed is derived from
+        param arg4: the number of worker processes, None for one per CPU, 0 to play every run in this process
+        """
+        self.num_runs = num_runs
+        self.num_enemies = num_enemies
+        self.base_seed = base_seed
+        self.workers = workers
+
+    def seed_for(self, run: int) -> int:
+        """
+        Returns the seed of a run
+
+        param arg1: the index of the run
+
+        Complexity: O(1)
+        """
+        return StreamRandom(self.base_seed).split(run).getrandbits(64)
+
+    def results(self) -> Iterator[Tuple[int, int, int, int]]:
+        """
+        Plays every run, yielding the (run, seed, enemies defeated, lives left) of each one as soon as it finishes
+        Closing the generator early (a break in the caller's loop) cancels the runs that have not started yet
+
+        Complexity: O(n) runs of run_tower(), n is num_runs
+        """
+        if self.workers == 0:
+            for run in range(self.num_runs):
+                yield run_tower(run, self.seed_for(run), self.num_enemies)
+            return
+        executor = ProcessPoolExecutor(max_workers=self.workers)
+        try:
+            futures = [executor.submit(run_tower, run, self.seed_for(run), self.num_enemies) for run in range(self.num_runs)]
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            # only waits for the runs already in progress, not for the whole queue
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def summary(self) -> Tuple[int, int, int]:
+        """
+        Plays every run and aggregates them
+
+        Returns:
+            int: the number of runs
+            int: the total number of enemies defeated
+            int: the total number of lives left
+
+        Complexity: same as results()
+        """
+        runs = 0
+        defeated = 0
+        lives = 0
+        for _, _, enemies_defeated, lives_left in self.results():
+            runs += 1
+            defeated += enemies_defeated
+            lives += lives_left
+        return runs, defeated, lives
+
+
+if __name__ == '__main__':
+    print(Tournament(num_runs=8, num_enemies=10).summary())
@@ -7,23 +7,122 @@ __author__ = "Teh Yee Hong"
 from poke_team import Trainer, PokeTeam
 from battle import Battle
 from battle_mode import BattleMode
-from data_structures.queue_adt import CircularQueue
+from data_structures.queue_adt import Queue, CircularQueue
 from data_structures.sorted_list_adt import ListItem
-from typing import Tuple
+from typing import AsyncIterator, Iterator, Tuple
+from array import array
+import asyncio
 import random
 
 
+class EnemyQueue(Queue[ListItem]):
+    """
+    The queue of a tower's enemies, holding every enemy that has not fought yet as its drawn species and lives only.
+
+    species keeps PokeTeam.TEAM_LIMIT positions in get_all_pokemon_types() per enemy and lives its lives, in two compact
+    arrays, and an enemy becomes a ListItem(Trainer, lives) only when serve() reaches it.
+    An enemy that survives is appended behind every enemy that has not fought yet, as in a CircularQueue,
+    so those are served first, in order, and then the appended ones.
+
+    It is a Queue (append, serve, len, is_empty, is_full, clear) but not a CircularQueue: it has no array, front or
+    rear, the enemies that have not fought yet only exist as species and lives until they are served, and only the
+    enemies appended back are kept in returned, a CircularQueue.
+    """
+
+    def __init__(self, species: array, lives: array, rng=None) -> None:
+        """
+        Initializing a new instance of EnemyQueue
+
+        param arg1: the species positions, PokeTeam.TEAM_LIMIT per enemy
+        param arg2: the lives of every enemy
+        param arg3: the random generator given to the enemies' Trainer
+        """
+        Queue.__init__(self)
+        self.species = species
+        self.lives = lives
+        self.rng = rng
+        self.fresh = 0
+        self.returned = CircularQueue(len(lives))
+        self.length = len(lives)
+
+    def append(self, item: ListItem) -> None:
+        """
+        Adds an enemy to the rear of the queue
+
+        Complexity: O(1)
+        """
+        if self.is_full():
+            raise Exception("Queue is full")
+        self.returned.append(item)
+        self.length += 1
+
+    def serve(self) -> ListItem:
+        """
+        Deletes and returns the enemy at the front of the queue, building its Trainer if it has not fought yet
+
+        Complexity: O(1), plus building the Trainer the first time
+        """
+        if self.is_empty():
+            raise Exception("Queue is empty")
+        self.length -= 1
+        if self.fresh < len(self.lives):
+            self.fresh += 1
+            return self.materialize(self.fresh - 1)
+        return self.returned.serve()
+
+    def materialize(self, index: int) -> ListItem:
+        """
+        Builds an enemy that has not fought yet, with the same team the eager generation would have given it
+
+        param arg1: the position of the enemy in the tower
+
+        Returns: ListItem(Trainer, lives)
+
+        Complexity: O(1), a team is TEAM_LIMIT Pokemon
+        """
+        enemy = Trainer(f"Trainer {index}", self.rng)
+        start = index * PokeTeam.TEAM_LIMIT
+        enemy.get_team().choose_by_index(self.species[start:start + PokeTeam.TEAM_LIMIT])
+        enemy.register_team()
+        return ListItem(enemy, self.lives[index])
+
+    def is_full(self) -> bool:
+        """
+        True when every enemy of the tower is in the queue
+
+        Complexity: O(1)
+        """
+        return len(self) == len(self.lives)
+
+    def clear(self) -> None:
+        """
+        Clears all enemies from the queue
+        """
+        Queue.clear(self)
+        self.fresh = len(self.lives)
+        self.returned.clear()
+
+
 class BattleTower:
     """
     This class represents a Pokemon Gym, where it is required to defeat every Trainer inside it to get the badge
+
+    enemies is an EnemyQueue since the enemies are built lazily, it used to be a CircularQueue of ListItem(Trainer, lives):
+    code that went through the Queue methods (serve, append, len, is_empty) works as before, code that read its array,
+    front or rear directly has to serve the enemies instead
     """
     MIN_LIVES = 1
     MAX_LIVES = 3
 
-    def __init__(self) -> None:
+    def __init__(self, rng=None, cache=None) -> None:
         """
         Initializing a new instance of the class
+
+        param arg1: the random generator of the lives and of the enemies' teams, the random module when not given
+        param arg2: an optional battle_cache.BattleCache shared by every battle of the tower
         """
+        self.rng = rng if rng is not None else random
+        self.cache = cache
         self.the_trainer = None
         self.enemies = None
         self.enemies_defeated_count = 0
@@ -37,26 +136,27 @@ class BattleTower:
 
         Complexity: O(1)
         """
-        lives = random.randint(self.MIN_LIVES, self.MAX_LIVES)
+        lives = self.rng.randint(self.MIN_LIVES, self.MAX_LIVES)
         self.the_trainer = ListItem(trainer, lives)
 
     def generate_enemy_trainers(self, num_teams: int) -> None:
         """
         This function is used to generate total numbers of enemies in the tower and their lives
 
+        Only the random numbers are drawn here, in the same order as building every Trainer would draw them,
+        the Trainers are built by the EnemyQueue when they are served, see EnemyQueue
+
         param arg1: int: number of enemies inside the tower
 
         Complexity: O(n) best = worst
         """
-        self.enemies = CircularQueue(num_teams)
-        count = 0
-        while not self.enemies.is_full():
-            enemy = Trainer(f"Trainer {count}")
-            enemy.pick_team("Random")
-            lives = random.randint(self.MIN_LIVES, self.MAX_LIVES)
-            e = ListItem(enemy, lives)
-            self.enemies.append(e)
-            count += 1
+        count = max(CircularQueue.MIN_CAPACITY, num_teams)
+        species = array("H")
+        lives = array("L")
+        for _ in range(count):
+            species.extend(PokeTeam.draw_indices(self.rng))
+            lives.append(self.rng.randint(self.MIN_LIVES, self.MAX_LIVES))
+        self.enemies = EnemyQueue(species, lives, self.rng)
 
     def battles_remaining(self) -> bool:
         """
@@ -88,7 +188,7 @@ class BattleTower:
             O(n^2) for both cases
         """
         current_enemy = self.enemies.serve()
-        b = Battle(self.the_trainer.value, current_enemy.value, BattleMode.ROTATE)
+        b = Battle(self.the_trainer.value, current_enemy.value, BattleMode.ROTATE, cache=self.cache)
         b._create_teams()
         winner = b.commence_battle()
 
@@ -120,3 +220,54 @@ class BattleTower:
         Returns: Integers of enemies defeated
         """
         return self.enemies_defeated_count
+
+    def battles(self, max_battles: int = None, checkpoint=None) -> Iterator[Tuple[str, str, str, int, int]]:
+        """
+        Plays the tower lazily, one next_battle() per result asked for, until battles_remaining() is False
+
+        Nothing is played ahead of the consumer, so stopping the iteration (break, close()) cancels the rest of the tower
+        and leaves it as it is, a later call to battles() or next_battle() carries on from there.
+
+        param arg1: the number of battles to play at most, all of them when not given
+        param arg2: an optional checkpoint.AutoCheckpoint, given the tower after every battle, before its result is yielded
+
+        Returns: a generator of the results of next_battle()
+
+        Complexity: O(n) calls to next_battle(), n is the number of battles played
+        """
+        played = 0
+        while self.battles_remaining() and (max_battles is None or played < max_battles):
+            result = self.next_battle()
+            if checkpoint is not None:
+                checkpoint.after_battle(self)
+            yield result
+            played += 1
+
+    def __iter__(self) -> Iterator[Tuple[str, str, str, int, int]]:
+        """
+        Returns: battles(), so a tower can be played with a for loop
+
+        Complexity: O(1)
+        """
+        return self.battles()
+
+    async def stream(self, max_battles: int = None) -> AsyncIterator[Tuple[str, str, str, int, int]]:
+        """
+        Async version of battles(), every battle is played in a worker thread (asyncio.to_thread), so the event loop
+        keeps serving other coroutines while a long battle is fought
+
+        The next battle is only played when the consumer asks for it, so a slow consumer holds the tower back
+        instead of results piling up, and cancelling the consumer task (or aclose()) cancels the rest of the tower.
+        A thread cannot be interrupted: a battle already started when the consumer is cancelled still finishes and
+        counts in the tower, only its result is lost. Nothing else may use the tower while a battle is being played.
+
+        param arg1: the number of battles to play at most, all of them when not given
+
+        Returns: an async generator of the results of next_battle()
+
+        Complexity: same as battles()
+        """
+        played = 0
+        while self.battles_remaining() and (max_battles is None or played < max_battles):
+            yield await asyncio.to_thread(self.next_battle)
+            played += 1